@@ -0,0 +1,45 @@
+"""
+Aplica as migrações SQL de Scripts/migracoes em ordem, registrando as já aplicadas na tabela
+migracoes_aplicadas.
+
+Bancos novos recebem o esquema atual por `Base.metadata.create_all`, por isso as migrações devem
+ser idempotentes (IF NOT EXISTS / IF EXISTS): em um banco novo elas não alteram nada.
+
+Uso:
+    python -m Scripts.aplicar_migracoes
+"""
+import os
+
+from sqlalchemy import text
+
+from app.db import Base as _modelos  # registra todos os modelos no metadata
+from app.db.database import Base, engine
+
+DIRETORIO_MIGRACOES = os.path.join(os.path.dirname(__file__), "migracoes")
+
+
+def aplicar_migracoes():
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conexao:
+        conexao.execute(text(
+            "CREATE TABLE IF NOT EXISTS migracoes_aplicadas ("
+            "nome VARCHAR PRIMARY KEY, aplicada_em TIMESTAMP NOT NULL DEFAULT now())"
+        ))
+        aplicadas = set(conexao.execute(text("SELECT nome FROM migracoes_aplicadas")).scalars())
+
+    for nome in sorted(os.listdir(DIRETORIO_MIGRACOES)):
+        if not nome.endswith(".sql") or nome in aplicadas:
+            continue
+        with open(os.path.join(DIRETORIO_MIGRACOES, nome), encoding="utf-8") as arquivo:
+            sql = arquivo.read()
+        print(f"Aplicando migração {nome}...")
+        with engine.begin() as conexao:
+            conexao.exec_driver_sql(sql)
+            conexao.execute(text("INSERT INTO migracoes_aplicadas (nome) VALUES (:nome)"), {"nome": nome})
+
+    print("Migrações aplicadas com sucesso!")
+
+
+if __name__ == "__main__":
+    aplicar_migracoes()
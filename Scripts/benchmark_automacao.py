@@ -0,0 +1,85 @@
+"""
+Executa uma rodada da automação de notificação de vazamentos, esvazia a caixa de saída de
+e-mails e mede o tempo de cada fase e o total, de ponta a ponta.
+Pensado para rodar sem rede, contra o servidor local da HIBP e um servidor SMTP local:
+
+    python -m Scripts.hibp_stub --porta 8081 &
+    python -m aiosmtpd -n -l 127.0.0.1:1025 &
+    HIBP_API_BASE_URL=http://127.0.0.1:8081/api/v3 \
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=false SMTP_USERNAME= \
+    python -m Scripts.benchmark_automacao
+
+O limite de 10 requisições/minuto da chave HIBP mediria só o limitador, então o script eleva
+HIBP_REQUISICOES_POR_MINUTO e HIBP_RAJADA_MAXIMA quando não definidos. Defina-os para simular a cota real.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+
+# Precisa vir antes dos imports da aplicação, que leem o limite ao carregar o módulo.
+os.environ.setdefault("HIBP_REQUISICOES_POR_MINUTO", "600000")
+os.environ.setdefault("HIBP_RAJADA_MAXIMA", "1000")
+
+from sqlalchemy import func, select
+
+from app.db.database import AsyncSessionLocal, SessionLocal, async_engine
+from app.models.emails.models import EmailPendente
+from app.models.automacoes.models import ExecucaoAutomacao, ShardExecucao
+from app.services.EmailService import encerrar_pool_smtp
+from app.services.automacoes.EntregaEmails import entregar_emails_pendentes
+from app.services.automacoes.VazamentoAutomacao import automatizar_notificacao_vazamentos
+from app.utils.HibpClient import iniciar_cliente_hibp, encerrar_cliente_hibp
+
+
+async def _contar_emails_prontos() -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(
+            select(func.count(EmailPendente.id)).where(
+                EmailPendente.status.in_(["pendente", "enviando"]),
+                EmailPendente.proxima_tentativa_em <= datetime.utcnow(),
+            )
+        )
+
+
+async def _esvaziar_caixa_de_saida():
+    # E-mails que falharam e foram reagendados com backoff ficam para depois e não seguram o benchmark.
+    # Para também se uma rodada não andar (ex.: erro no banco), em vez de repetir para sempre.
+    anterior = None
+    prontos = await _contar_emails_prontos()
+    while prontos and prontos != anterior:
+        await entregar_emails_pendentes()
+        anterior, prontos = prontos, await _contar_emails_prontos()
+
+
+async def executar_benchmark():
+    iniciar_cliente_hibp()
+    inicio = time.perf_counter()
+    duracao_automacao = 0.0
+    try:
+        await automatizar_notificacao_vazamentos()
+        duracao_automacao = time.perf_counter() - inicio
+        await _esvaziar_caixa_de_saida()
+    finally:
+        duracao = time.perf_counter() - inicio
+        await encerrar_cliente_hibp()
+        await encerrar_pool_smtp()
+        await async_engine.dispose()
+
+    db = SessionLocal()
+    try:
+        execucao = db.query(ExecucaoAutomacao).order_by(ExecucaoAutomacao.id.desc()).first()
+        shards = db.query(ShardExecucao).filter(ShardExecucao.execucao_id == execucao.id).all() if execucao else []
+        processados = sum(shard.usuarios_processados for shard in shards)
+        falhas = sum(shard.falhas for shard in shards)
+    finally:
+        db.close()
+
+    print(f"Execução: {execucao.id if execucao else '-'} ({execucao.status if execucao else '-'})")
+    print(f"Usuários processados: {processados} | falhas: {falhas}")
+    print(f"Automação: {duracao_automacao:.1f}s | entrega dos e-mails: {duracao - duracao_automacao:.1f}s")
+    print(f"Tempo total: {duracao:.1f}s | {processados / duracao if duracao else 0:.1f} usuários/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(executar_benchmark())
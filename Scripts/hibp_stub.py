@@ -0,0 +1,191 @@
+"""
+Servidor local que imita a API Have I Been Pwned para testes de carga e benchmarks, sem rede
+e sem consumir a cota da chave de API.
+
+Uso:
+    python -m Scripts.hibp_stub --porta 8081 --latencia-ms 150 --taxa-429 0.02
+
+E na aplicação:
+    HIBP_API_BASE_URL=http://127.0.0.1:8081/api/v3
+
+Os dados vêm de um arquivo de fixtures gravado (--fixtures) ou são gerados de forma
+determinística: o mesmo e-mail sempre retorna os mesmos vazamentos.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+CLASSES_DE_DADOS = [
+    "Email addresses", "Passwords", "Usernames", "IP addresses", "Names", "Phone numbers",
+    "Dates of birth", "Physical addresses", "Genders", "Geographic locations", "Credit cards",
+]
+
+config = {
+    "latencia_ms": int(os.getenv("HIBP_STUB_LATENCIA_MS", "100")),
+    "variacao_latencia_ms": int(os.getenv("HIBP_STUB_VARIACAO_LATENCIA_MS", "50")),
+    "taxa_erro": float(os.getenv("HIBP_STUB_TAXA_ERRO", "0")),
+    "taxa_429": float(os.getenv("HIBP_STUB_TAXA_429", "0")),
+    "retry_after": int(os.getenv("HIBP_STUB_RETRY_AFTER", "2")),
+    "taxa_contas_vazadas": float(os.getenv("HIBP_STUB_TAXA_CONTAS_VAZADAS", "0.3")),
+    "max_vazamentos_por_conta": int(os.getenv("HIBP_STUB_MAX_VAZAMENTOS_POR_CONTA", "8")),
+}
+
+app = FastAPI(title="HIBP stub")
+
+catalogo: list[dict] = []
+catalogo_por_nome: dict[str, dict] = {}
+contas_gravadas: dict[str, list[str]] = {}
+
+
+def gerar_catalogo(total: int) -> list[dict]:
+    gerador = random.Random(42)
+    inicio = datetime(2010, 1, 1)
+    vazamentos = []
+    for i in range(total):
+        data_vazamento = inicio + timedelta(days=gerador.randint(0, 5000))
+        data_adicao = data_vazamento + timedelta(days=gerador.randint(30, 400))
+        nome = f"Vazamento{i:04d}"
+        vazamentos.append({
+            "Name": nome,
+            "Title": f"Vazamento {i:04d}",
+            "Domain": f"{nome.lower()}.example.com",
+            "BreachDate": data_vazamento.strftime("%Y-%m-%d"),
+            "AddedDate": data_adicao.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "ModifiedDate": data_adicao.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "PwnCount": gerador.randint(1_000, 50_000_000),
+            "Description": f"Dados de {nome} foram expostos em um incidente de segurança simulado.",
+            "LogoPath": "https://haveibeenpwned.com/Content/Images/PwnedLogos/List.png",
+            "DataClasses": gerador.sample(CLASSES_DE_DADOS, gerador.randint(2, 5)),
+            "IsVerified": True,
+            "IsFabricated": False,
+            "IsSensitive": False,
+            "IsRetired": False,
+            "IsSpamList": False,
+        })
+    return vazamentos
+
+
+def carregar_dados(caminho_fixtures: str | None, total_vazamentos: int):
+    global catalogo, contas_gravadas
+    if caminho_fixtures:
+        with open(caminho_fixtures, encoding="utf-8") as arquivo:
+            fixtures = json.load(arquivo)
+        catalogo = fixtures.get("breaches", [])
+        contas_gravadas = {email.lower(): nomes for email, nomes in fixtures.get("contas", {}).items()}
+    else:
+        catalogo = gerar_catalogo(total_vazamentos)
+    catalogo_por_nome.clear()
+    catalogo_por_nome.update({vazamento["Name"]: vazamento for vazamento in catalogo})
+
+
+def vazamentos_da_conta(email: str) -> list[str]:
+    email = email.strip().lower()
+    if email in contas_gravadas:
+        return contas_gravadas[email]
+
+    semente = int(hashlib.sha256(email.encode()).hexdigest(), 16)
+    gerador = random.Random(semente)
+    if not catalogo or gerador.random() >= config["taxa_contas_vazadas"]:
+        return []
+    quantidade = gerador.randint(1, min(config["max_vazamentos_por_conta"], len(catalogo)))
+    return [vazamento["Name"] for vazamento in gerador.sample(catalogo, quantidade)]
+
+
+async def simular_rede() -> Response | None:
+    variacao = config["variacao_latencia_ms"]
+    latencia = max(0, config["latencia_ms"] + random.randint(-variacao, variacao))
+    await asyncio.sleep(latencia / 1000)
+
+    sorteio = random.random()
+    if sorteio < config["taxa_429"]:
+        return JSONResponse(
+            status_code=429,
+            content={"statusCode": 429, "message": "Rate limit is exceeded."},
+            headers={"Retry-After": str(config["retry_after"])},
+        )
+    if sorteio < config["taxa_429"] + config["taxa_erro"]:
+        return JSONResponse(status_code=503, content={"statusCode": 503, "message": "Service unavailable."})
+    return None
+
+
+@app.on_event("startup")
+async def startup_event():
+    # Permite subir o stub também com `uvicorn Scripts.hibp_stub:app`, configurado por variáveis de ambiente.
+    if not catalogo:
+        carregar_dados(os.getenv("HIBP_STUB_FIXTURES"), int(os.getenv("HIBP_STUB_TOTAL_VAZAMENTOS", "800")))
+
+
+@app.get("/api/v3/breachedaccount/{email}")
+async def breached_account(email: str, request: Request):
+    falha = await simular_rede()
+    if falha:
+        return falha
+
+    nomes = vazamentos_da_conta(email)
+    if not nomes:
+        return Response(status_code=404)
+
+    truncado = request.query_params.get("truncateResponse", "true").lower() != "false"
+    if truncado:
+        return [{"Name": nome} for nome in nomes]
+    return [catalogo_por_nome[nome] for nome in nomes if nome in catalogo_por_nome]
+
+
+@app.get("/api/v3/breaches")
+async def breaches():
+    falha = await simular_rede()
+    if falha:
+        return falha
+    return catalogo
+
+
+def gravar_catalogo_real(caminho: str):
+    """
+    Grava o catálogo público real (/breaches não exige chave) como arquivo de fixtures.
+    """
+    response = httpx.get("https://haveibeenpwned.com/api/v3/breaches", headers={"User-Agent": "Osint Cyber"})
+    response.raise_for_status()
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump({"breaches": response.json(), "contas": {}}, arquivo, ensure_ascii=False)
+    print(f"Catálogo real gravado em {caminho} ({len(response.json())} vazamentos).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API HIBP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8081)
+    parser.add_argument("--fixtures", help="Arquivo JSON com {'breaches': [...], 'contas': {email: [nomes]}}.")
+    parser.add_argument("--gravar-catalogo", metavar="ARQUIVO", help="Grava o catálogo real da HIBP e sai.")
+    parser.add_argument("--total-vazamentos", type=int, default=800)
+    parser.add_argument("--latencia-ms", type=int, default=config["latencia_ms"])
+    parser.add_argument("--variacao-latencia-ms", type=int, default=config["variacao_latencia_ms"])
+    parser.add_argument("--taxa-erro", type=float, default=config["taxa_erro"])
+    parser.add_argument("--taxa-429", type=float, default=config["taxa_429"])
+    parser.add_argument("--retry-after", type=int, default=config["retry_after"])
+    parser.add_argument("--taxa-contas-vazadas", type=float, default=config["taxa_contas_vazadas"])
+    args = parser.parse_args()
+
+    if args.gravar_catalogo:
+        gravar_catalogo_real(args.gravar_catalogo)
+        raise SystemExit(0)
+
+    config.update({
+        "latencia_ms": args.latencia_ms,
+        "variacao_latencia_ms": args.variacao_latencia_ms,
+        "taxa_erro": args.taxa_erro,
+        "taxa_429": args.taxa_429,
+        "retry_after": args.retry_after,
+        "taxa_contas_vazadas": args.taxa_contas_vazadas,
+    })
+    carregar_dados(args.fixtures, args.total_vazamentos)
+    print(f"HIBP stub com {len(catalogo)} vazamentos em http://{args.host}:{args.porta}/api/v3")
+    uvicorn.run(app, host=args.host, port=args.porta, log_level="warning")
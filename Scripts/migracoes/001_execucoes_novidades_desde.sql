@@ -0,0 +1,2 @@
+-- Data de corte das novidades do catálogo usada por cada execução da automação.
+ALTER TABLE execucoes_automacao ADD COLUMN IF NOT EXISTS novidades_desde TIMESTAMP NULL;
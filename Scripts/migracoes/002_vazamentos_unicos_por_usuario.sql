@@ -0,0 +1,22 @@
+-- Remove vazamentos duplicados do mesmo usuário (mantém o mais antigo) e cria a restrição
+-- única usada pelo INSERT ... ON CONFLICT DO NOTHING. Em bancos novos a tabela `vazamentos`
+-- não existe mais (substituída por `usuarios_vazamentos` na migração 005).
+DO $$
+BEGIN
+    IF to_regclass('vazamentos') IS NULL THEN
+        RETURN;
+    END IF;
+
+    DELETE FROM vazamentos v
+    USING vazamentos duplicado
+    WHERE v.usuario_id = duplicado.usuario_id
+      AND v.nome = duplicado.nome
+      AND v.data_vazamento IS NOT DISTINCT FROM duplicado.data_vazamento
+      AND v.id > duplicado.id;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_vazamento_usuario_nome_data') THEN
+        ALTER TABLE vazamentos
+            ADD CONSTRAINT uq_vazamento_usuario_nome_data
+            UNIQUE NULLS NOT DISTINCT (usuario_id, nome, data_vazamento);
+    END IF;
+END $$;
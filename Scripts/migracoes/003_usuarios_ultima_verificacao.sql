@@ -0,0 +1,12 @@
+-- Data da última verificação de vazamentos de cada usuário, usada pela verificação contínua.
+ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS ultima_verificacao_em TIMESTAMP NULL;
+
+-- Espalha os usuários já existentes ao longo da última semana, para que a primeira passada
+-- não trate todos como prioritários ao mesmo tempo.
+UPDATE usuarios
+SET ultima_verificacao_em = (now() AT TIME ZONE 'utc') - random() * INTERVAL '7 days'
+WHERE notificacoes_ativadas AND ultima_verificacao_em IS NULL;
+
+CREATE INDEX IF NOT EXISTS ix_usuarios_verificacao_pendente
+    ON usuarios (ultima_verificacao_em NULLS FIRST)
+    WHERE notificacoes_ativadas;
@@ -0,0 +1,5 @@
+-- Métricas consolidadas de cada execução da automação.
+ALTER TABLE execucoes_automacao ADD COLUMN IF NOT EXISTS metricas JSONB NULL;
+
+-- Execução que originou cada e-mail da caixa de saída, para contabilizar envios e falhas.
+ALTER TABLE emails_pendentes ADD COLUMN IF NOT EXISTS origem VARCHAR NULL;
@@ -0,0 +1,33 @@
+-- Normaliza os vazamentos: os metadados ficam apenas em `catalogo_vazamentos` e cada usuário
+-- guarda só a associação em `usuarios_vazamentos` (criada pelo create_all). Vazamentos que
+-- ainda não estão no catálogo são copiados antes, usando a versão mais recente de cada nome.
+-- Em `vazamentos`, data_adicao registrava quando o vazamento foi gravado para o usuário: a menor
+-- delas vira a data da primeira detecção.
+-- As classes de dados são convertidas para jsonb: o create_all pode já ter criado a coluna do
+-- catálogo como JSONB (sem conversão implícita de texto); se ela ainda for texto, o valor volta a texto.
+DO $$
+BEGIN
+    IF to_regclass('vazamentos') IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO catalogo_vazamentos (nome, titulo, dominio_url, data_vazamento, data_adicao,
+                                     data_atualizacao, pwn_count, descricao, image_uri, data_classes)
+    SELECT DISTINCT ON (v.nome)
+           v.nome, v.titulo, v.dominio_url, v.data_vazamento, v.data_adicao,
+           v.data_atualizacao, v.pwn_count, v.descricao, v.image_uri,
+           COALESCE(NULLIF(v.data_classes, ''), '[]')::jsonb
+    FROM vazamentos v
+    WHERE NOT EXISTS (SELECT 1 FROM catalogo_vazamentos c WHERE c.nome = v.nome)
+    ORDER BY v.nome, v.data_atualizacao DESC NULLS LAST, v.id DESC
+    ON CONFLICT (nome) DO NOTHING;
+
+    INSERT INTO usuarios_vazamentos (usuario_id, catalogo_vazamento_id, primeira_deteccao_em)
+    SELECT v.usuario_id, c.id, COALESCE(MIN(v.data_adicao), now() AT TIME ZONE 'utc')
+    FROM vazamentos v
+    JOIN catalogo_vazamentos c ON c.nome = v.nome
+    GROUP BY v.usuario_id, c.id
+    ON CONFLICT DO NOTHING;
+
+    DROP TABLE vazamentos;
+END $$;
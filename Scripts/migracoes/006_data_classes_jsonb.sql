@@ -0,0 +1,20 @@
+-- Converte `data_classes` (JSON em texto) para JSONB e cria o índice GIN usado no filtro
+-- por classe de dados (operador @>).
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'catalogo_vazamentos' AND column_name = 'data_classes') <> 'jsonb' THEN
+        ALTER TABLE catalogo_vazamentos
+            ALTER COLUMN data_classes TYPE JSONB
+            USING COALESCE(NULLIF(data_classes, ''), '[]')::jsonb;
+    END IF;
+END $$;
+
+UPDATE catalogo_vazamentos SET data_classes = '[]'::jsonb WHERE data_classes IS NULL;
+
+ALTER TABLE catalogo_vazamentos
+    ALTER COLUMN data_classes SET DEFAULT '[]'::jsonb,
+    ALTER COLUMN data_classes SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS ix_catalogo_vazamentos_data_classes
+    ON catalogo_vazamentos USING gin (data_classes);
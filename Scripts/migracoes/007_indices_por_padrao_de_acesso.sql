@@ -0,0 +1,18 @@
+-- Remove índices que nenhuma consulta usa (cada escrita pagava por eles), inclusive os
+-- duplicados das chaves primárias, e cria o índice parcial da varredura de usuários com
+-- notificações ativadas.
+DROP INDEX IF EXISTS ix_usuarios_id;
+DROP INDEX IF EXISTS ix_usuarios_nome;
+DROP INDEX IF EXISTS ix_usuarios_senha;
+DROP INDEX IF EXISTS ix_usuarios_avatar;
+DROP INDEX IF EXISTS ix_usuarios_data_criacao;
+DROP INDEX IF EXISTS ix_usuarios_role;
+DROP INDEX IF EXISTS ix_usuarios_notificacoes_ativadas;
+DROP INDEX IF EXISTS ix_catalogo_vazamentos_id;
+DROP INDEX IF EXISTS ix_execucoes_automacao_id;
+DROP INDEX IF EXISTS ix_shards_execucao_id;
+DROP INDEX IF EXISTS ix_emails_pendentes_id;
+
+CREATE INDEX IF NOT EXISTS ix_usuarios_com_notificacoes
+    ON usuarios (id)
+    WHERE notificacoes_ativadas;
@@ -0,0 +1,4 @@
+-- Atende a listagem paginada dos vazamentos do usuário, ordenada por (primeira_deteccao_em,
+-- catalogo_vazamento_id) dentro de cada usuario_id, sem ordenar as linhas na consulta.
+CREATE INDEX IF NOT EXISTS ix_usuarios_vazamentos_deteccao
+    ON usuarios_vazamentos (usuario_id, primeira_deteccao_em, catalogo_vazamento_id);
@@ -0,0 +1,66 @@
+"""
+Cria usuários sintéticos com notificações ativadas para benchmarks da automação de vazamentos
+contra o servidor local Scripts/hibp_stub.py.
+
+Uso:
+    python -m Scripts.popular_usuarios_benchmark --quantidade 100000
+    python -m Scripts.popular_usuarios_benchmark --remover
+"""
+import argparse
+import uuid
+
+from sqlalchemy import insert, delete
+
+from app.db.database import SessionLocal
+from app.models.usuarios.UsuarioModel import Usuario
+from app.models.vazamentos import models
+from app.security.security import hash_password
+
+DOMINIO_BENCHMARK = "benchmark.local"
+
+
+def popular_usuarios(quantidade: int, tamanho_lote: int):
+    senha = hash_password("benchmark")
+    db = SessionLocal()
+    try:
+        for inicio in range(0, quantidade, tamanho_lote):
+            lote = [
+                {
+                    "id": uuid.uuid4(),
+                    "nome": f"Usuario Benchmark {i}",
+                    "email": f"usuario{i}@{DOMINIO_BENCHMARK}",
+                    "senha": senha,
+                    "notificacoes_ativadas": True,
+                }
+                for i in range(inicio, min(inicio + tamanho_lote, quantidade))
+            ]
+            db.execute(insert(Usuario), lote)
+            db.commit()
+            print(f"{inicio + len(lote)}/{quantidade} usuários criados.")
+    finally:
+        db.close()
+
+
+def remover_usuarios():
+    db = SessionLocal()
+    try:
+        ids_benchmark = db.query(Usuario.id).filter(Usuario.email.like(f"%@{DOMINIO_BENCHMARK}")).scalar_subquery()
+        db.execute(delete(models.UsuarioVazamento).where(models.UsuarioVazamento.usuario_id.in_(ids_benchmark)))
+        resultado = db.execute(delete(Usuario).where(Usuario.email.like(f"%@{DOMINIO_BENCHMARK}")))
+        db.commit()
+        print(f"{resultado.rowcount} usuários de benchmark removidos.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Popula usuários sintéticos para benchmarks.")
+    parser.add_argument("--quantidade", type=int, default=100_000)
+    parser.add_argument("--tamanho-lote", type=int, default=5_000)
+    parser.add_argument("--remover", action="store_true", help="Remove os usuários de benchmark e seus vazamentos.")
+    args = parser.parse_args()
+
+    if args.remover:
+        remover_usuarios()
+    else:
+        popular_usuarios(args.quantidade, args.tamanho_lote)
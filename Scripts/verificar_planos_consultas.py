@@ -0,0 +1,159 @@
+"""
+Verifica, com EXPLAIN, se as consultas principais dos serviços usam índices. Falha (código de
+saída 1) quando uma consulta faz varredura sequencial ou ordenação que um índice deveria evitar.
+As consultas são montadas pelos mesmos construtores (`consulta_*`) que os serviços executam.
+
+As consultas rodam com `enable_seqscan` e `enable_sort` desligados: o planejador só escolhe uma
+varredura sequencial ou uma ordenação quando nenhum índice atende a consulta, então a verificação
+não depende do volume de dados do banco. Rode após aplicar as migrações:
+
+    python -m Scripts.verificar_planos_consultas
+"""
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.db.database import engine
+from app.services.CatalogoVazamentoService import consulta_catalogo_por_nomes
+from app.services.UsuarioService import (
+    consulta_contagem_usuarios_com_notificacoes,
+    consulta_lote_de_usuarios_com_notificacoes,
+    consulta_usuario_por_email,
+    consulta_usuario_por_id,
+    consulta_usuarios_para_verificacao,
+)
+from app.services.VazamentoService import (
+    consulta_algum_vazamento_do_usuario,
+    consulta_pagina_vazamentos,
+    consulta_pagina_vazamentos_do_usuario,
+    consulta_vazamento_do_usuario,
+    consulta_vazamentos_do_usuario,
+)
+
+VARREDURA_SEQUENCIAL = "Seq Scan"
+ORDENACAO = "Sort"
+
+
+class Explicar(Executable, ClauseElement):
+    """
+    EXPLAIN de um Select do SQLAlchemy: a consulta é compilada pelo mesmo dialeto usado pelos
+    serviços, com os parâmetros ligados normalmente.
+    """
+    inherit_cache = False
+
+    def __init__(self, consulta):
+        self.consulta = consulta
+
+
+@compiles(Explicar, "postgresql")
+def _compilar_explicar(elemento: Explicar, compilador, **kw) -> str:
+    return f"EXPLAIN (FORMAT JSON) {compilador.process(elemento.consulta, **kw)}"
+
+
+USUARIO_ID = uuid.uuid4()
+VERIFICADOS_ANTES = datetime.utcnow() - timedelta(days=7)
+
+# (descrição, consulta montada pelo construtor que o serviço usa, nós proibidos no plano)
+CONSULTAS = [
+    (
+        "UsuarioService.obter_usuario_pelo_email",
+        consulta_usuario_por_email("usuario@exemplo.com"),
+        {VARREDURA_SEQUENCIAL},
+    ),
+    (
+        "UsuarioService.obter_usuario_pelo_id",
+        consulta_usuario_por_id(USUARIO_ID),
+        {VARREDURA_SEQUENCIAL},
+    ),
+    (
+        "UsuarioService.iterar_lotes_de_usuarios_com_notificacoes_ativadas",
+        consulta_lote_de_usuarios_com_notificacoes(apos_id=USUARIO_ID),
+        {VARREDURA_SEQUENCIAL, ORDENACAO},
+    ),
+    (
+        "UsuarioService.iterar_lotes_de_usuarios_com_notificacoes_ativadas (verificados_antes)",
+        consulta_lote_de_usuarios_com_notificacoes(apos_id=USUARIO_ID, verificados_antes=VERIFICADOS_ANTES),
+        {VARREDURA_SEQUENCIAL, ORDENACAO},
+    ),
+    (
+        "UsuarioService.contar_usuarios_com_notificacoes_ativadas",
+        consulta_contagem_usuarios_com_notificacoes(),
+        {VARREDURA_SEQUENCIAL},
+    ),
+    (
+        "UsuarioService.reivindicar_usuarios_para_verificacao",
+        consulta_usuarios_para_verificacao(100, VERIFICADOS_ANTES),
+        {VARREDURA_SEQUENCIAL, ORDENACAO},
+    ),
+    (
+        "VazamentoService.obter_vazamento_do_usuario",
+        consulta_vazamento_do_usuario(USUARIO_ID, 0),
+        {VARREDURA_SEQUENCIAL},
+    ),
+    (
+        "VazamentoService.buscar_vazamentos_no_banco",
+        # A ordenação é permitida: é feita sobre os poucos vazamentos do usuário após a busca pela chave primária.
+        consulta_vazamentos_do_usuario(USUARIO_ID),
+        {VARREDURA_SEQUENCIAL},
+    ),
+    (
+        "VazamentoService.buscar_vazamentos_por_classes_de_dados",
+        consulta_vazamentos_do_usuario(USUARIO_ID, ["Passwords"]),
+        {VARREDURA_SEQUENCIAL},
+    ),
+    (
+        "VazamentoService.listar_vazamentos_do_usuario",
+        consulta_pagina_vazamentos_do_usuario(USUARIO_ID, 50, (VERIFICADOS_ANTES, 0)),
+        {VARREDURA_SEQUENCIAL, ORDENACAO},
+    ),
+    (
+        "VazamentoService.listar_vazamentos",
+        consulta_pagina_vazamentos(50, (USUARIO_ID, 0)),
+        {VARREDURA_SEQUENCIAL, ORDENACAO},
+    ),
+    (
+        "VazamentoService._buscar_na_api_e_salvar_no_db",
+        consulta_algum_vazamento_do_usuario(USUARIO_ID),
+        {VARREDURA_SEQUENCIAL},
+    ),
+    (
+        "CatalogoVazamentoService.obter_por_nomes",
+        consulta_catalogo_por_nomes(["Adobe", "LinkedIn"]),
+        {VARREDURA_SEQUENCIAL},
+    ),
+]
+
+
+def _nos_do_plano(plano: dict):
+    yield plano
+    for subplano in plano.get("Plans", []):
+        yield from _nos_do_plano(subplano)
+
+
+def verificar_planos() -> bool:
+    aprovado = True
+    with engine.connect() as conexao:
+        conexao.execute(text("SET enable_seqscan = off"))
+        conexao.execute(text("SET enable_sort = off"))
+        for descricao, consulta, proibidos in CONSULTAS:
+            plano = conexao.execute(Explicar(consulta)).scalar()[0]["Plan"]
+            encontrados = [
+                f"{no['Node Type']} em {no.get('Relation Name', '-')}"
+                for no in _nos_do_plano(plano)
+                if no["Node Type"] in proibidos
+            ]
+            if encontrados:
+                aprovado = False
+                print(f"FALHOU  {descricao}: {', '.join(encontrados)}")
+            else:
+                print(f"OK      {descricao}")
+        conexao.rollback()
+    return aprovado
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verificar_planos() else 1)
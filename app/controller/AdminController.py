@@ -0,0 +1,202 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_async_db_session
+from app.db.pool import obter_metricas_pool
+from app.db.replicas import obter_estado_replicas, sessao_de_leitura
+from app.db.redis.metricas_automacao import MetricasExecucao
+from app.models.automacoes.models import ExecucaoAutomacao
+from app.models.vazamentos import schemas
+from app.security.depends import get_async_db_session_leitura
+from app.services.AutenticacaoService import verify_role
+from app.services.ExecucaoAutomacaoService import ExecucaoAutomacaoService
+from app.services.VazamentoService import VazamentoService
+from app.utils.Paginacao import PAGINACAO_LIMITE_MAXIMO, PAGINACAO_LIMITE_PADRAO
+
+routeradmin = APIRouter(dependencies=[Depends(verify_role("admin"))])
+
+endpointAdmin = "/admin/"
+
+COLUNAS_EXPORTACAO_VAZAMENTOS = (
+    "usuario_id", "nome", "titulo", "dominio_url", "data_vazamento", "pwn_count", "data_classes",
+    "primeira_deteccao_em",
+)
+
+
+async def _montar_status_execucao(execucao: ExecucaoAutomacao, progresso: dict) -> dict:
+    # Métricas ao vivo do Redis (incluem e-mails entregues após a conclusão); senão, as gravadas no banco.
+    metricas = await MetricasExecucao(f"execucao:{execucao.id}").obter() or execucao.metricas
+    fim = execucao.finalizada_em or datetime.utcnow()
+    return {
+        "id": execucao.id,
+        "status": execucao.status,
+        "iniciada_em": execucao.iniciada_em,
+        "finalizada_em": execucao.finalizada_em,
+        "duracao_segundos": round((fim - execucao.iniciada_em).total_seconds(), 1),
+        "novidades_desde": execucao.novidades_desde,
+        "total_shards": execucao.total_shards,
+        "shards_concluidos": progresso.get("shards_concluidos", 0),
+        "usuarios_processados": progresso.get("usuarios_processados", 0),
+        "falhas": progresso.get("falhas", 0),
+        "metricas": metricas,
+    }
+
+
+@routeradmin.get(
+    endpointAdmin + "automacao/execucoes",
+    summary="Listar execuções da automação de vazamentos",
+    description=(
+        "Retorna as execuções mais recentes, em andamento e passadas, com progresso dos shards e métricas: "
+        "usuários processados, chamadas, latência e respostas 429 da HIBP, vazamentos novos, "
+        "e-mails enviados ou com falha e tempo por fase."
+    ),
+    tags=["Admin"],
+    response_model=list[dict],
+)
+async def listar_execucoes_automacao(limite: int = Query(20, ge=1, le=200),
+                                     db: AsyncSession = Depends(get_async_db_session)):
+    logging.info(f"Requisição recebida para listar as {limite} últimas execuções da automação.")
+    execucao_service = ExecucaoAutomacaoService(db)
+    execucoes = await execucao_service.listar_execucoes(limite)
+    progresso = await execucao_service.resumir_shards([execucao.id for execucao in execucoes])
+    return [await _montar_status_execucao(execucao, progresso.get(execucao.id, {})) for execucao in execucoes]
+
+
+@routeradmin.get(
+    endpointAdmin + "automacao/execucoes/{execucao_id}",
+    summary="Obter o status de uma execução da automação",
+    description="Retorna o status, as métricas e o progresso de cada shard da execução.",
+    tags=["Admin"],
+    response_model=dict,
+)
+async def obter_execucao_automacao(execucao_id: int, db: AsyncSession = Depends(get_async_db_session)):
+    execucao_service = ExecucaoAutomacaoService(db)
+    execucao = await execucao_service.obter_execucao(execucao_id)
+    progresso = (await execucao_service.resumir_shards([execucao.id])).get(execucao.id, {})
+    resposta = await _montar_status_execucao(execucao, progresso)
+    resposta["shards"] = [
+        {
+            "numero": shard.numero,
+            "status": shard.status,
+            "usuarios_processados": shard.usuarios_processados,
+            "falhas": shard.falhas,
+            "dono_lease": shard.dono_lease,
+            "atualizado_em": shard.atualizado_em,
+        }
+        for shard in sorted(execucao.shards, key=lambda shard: shard.numero)
+    ]
+    return resposta
+
+
+@routeradmin.get(
+    endpointAdmin + "automacao/verificacao-continua",
+    summary="Métricas diárias da verificação contínua",
+    description="Retorna as métricas da verificação contínua de vazamentos agregadas por dia (UTC).",
+    tags=["Admin"],
+    response_model=list[dict],
+)
+async def obter_metricas_verificacao_continua(dias: int = Query(7, ge=1, le=30)):
+    hoje = datetime.utcnow().date()
+    resposta = []
+    for deslocamento in range(dias):
+        dia = (hoje - timedelta(days=deslocamento)).isoformat()
+        metricas = await MetricasExecucao(f"continua:{dia}").obter()
+        if metricas:
+            resposta.append({"dia": dia, "metricas": metricas})
+    return resposta
+
+
+@routeradmin.get(
+    endpointAdmin + "banco/pool",
+    summary="Métricas do pool de conexões com o banco",
+    description=(
+        "Retorna a configuração e o estado dos pools de conexões do processo que atendeu a requisição: "
+        "conexões em uso, overflow, checkouts, tempo de espera por conexão e timeouts."
+    ),
+    tags=["Admin"],
+    response_model=dict,
+)
+async def obter_metricas_pool_banco():
+    return obter_metricas_pool()
+
+
+
+@routeradmin.get(
+    endpointAdmin + "banco/replicas",
+    summary="Estado das réplicas de leitura",
+    description=(
+        "Retorna o atraso de cada réplica de leitura medido pelo processo que atendeu a requisição e se ela "
+        "está recebendo leituras. Réplicas com atraso acima do limite ou inacessíveis ficam fora do roteamento."
+    ),
+    tags=["Admin"],
+    response_model=dict,
+)
+async def obter_estado_replicas_banco():
+    return obter_estado_replicas()
+
+
+@routeradmin.get(
+    endpointAdmin + "vazamentos",
+    summary="Listar os vazamentos de todos os usuários",
+    description=(
+        "Retorna uma página dos vazamentos registrados para todos os usuários, paginada por cursor. "
+        "Para obter a próxima página, envie o `proximo_cursor` da resposta em `cursor`."
+    ),
+    tags=["Admin"],
+    response_model=schemas.PaginaVazamentos,
+)
+async def listar_vazamentos(limite: int = Query(PAGINACAO_LIMITE_PADRAO, ge=1, le=PAGINACAO_LIMITE_MAXIMO),
+                            cursor: Optional[str] = None,
+                            db: AsyncSession = Depends(get_async_db_session_leitura)):
+    logging.info(f"Requisição recebida para listar os vazamentos de todos os usuários (limite: {limite})")
+    return await VazamentoService(db).listar_vazamentos(limite, cursor)
+
+
+async def _gerar_exportacao_vazamentos(formato: str) -> AsyncIterator[str]:
+    # A sessão é aberta aqui, e não por dependência, para durar enquanto a resposta é transmitida.
+    async with sessao_de_leitura() as db:
+        if formato == "csv":
+            yield ",".join(COLUNAS_EXPORTACAO_VAZAMENTOS) + "\r\n"
+        total = 0
+        async for lote in VazamentoService(db).exportar_vazamentos():
+            buffer = io.StringIO()
+            if formato == "csv":
+                escritor = csv.writer(buffer)
+                for linha in lote:
+                    valores = linha._asdict()
+                    valores["data_classes"] = ";".join(valores["data_classes"] or [])
+                    escritor.writerow([valores[coluna] for coluna in COLUNAS_EXPORTACAO_VAZAMENTOS])
+            else:
+                for linha in lote:
+                    buffer.write(json.dumps(linha._asdict(), default=str, ensure_ascii=False) + "\n")
+            total += len(lote)
+            yield buffer.getvalue()
+        logging.info(f"Exportação de vazamentos ({formato}) concluída: {total} linhas.")
+
+
+@routeradmin.get(
+    endpointAdmin + "vazamentos/exportar",
+    summary="Exportar os vazamentos de todos os usuários",
+    description=(
+        "Transmite todos os vazamentos registrados, um por linha, em NDJSON ou CSV. As linhas são lidas "
+        "do banco com um cursor no servidor, com memória constante independentemente do volume."
+    ),
+    tags=["Admin"],
+    response_class=StreamingResponse,
+)
+async def exportar_vazamentos(formato: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    logging.info(f"Requisição recebida para exportar os vazamentos em {formato}.")
+    tipo_conteudo = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _gerar_exportacao_vazamentos(formato),
+        media_type=tipo_conteudo,
+        headers={"Content-Disposition": f'attachment; filename="vazamentos.{formato}"'},
+    )
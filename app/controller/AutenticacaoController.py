@@ -2,9 +2,9 @@ import logging
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db_session
+from app.db.database import get_async_db_session
 from app.db.redis.redis_cache import get_cache, set_cache, redis
 from app.models.autenticacao.login_schemas import ErrorResponse
 from app.models.usuarios.UsuarioModel import Usuario
@@ -77,7 +77,7 @@ async def obter_dados_do_usuario_logado(current_user: Usuario = Depends(get_curr
 )
 async def logar_usuario(
         form_data: OAuth2PasswordRequestForm = Depends(),
-        db: Session = Depends(get_db_session)
+        db: AsyncSession = Depends(get_async_db_session)
 ):
     """
         **Autenticar um usuário.**
@@ -88,11 +88,11 @@ async def logar_usuario(
     autenticacao_service = AutenticacaoService(db)
     usuario_service = UsuarioService(db)
     try:
-        usuario_token = autenticacao_service.autenticar_usuario(
+        usuario_token = await autenticacao_service.autenticar_usuario(
             email=form_data.username, password=form_data.password
         )
 
-        usuario_autenticado = usuario_service.obter_usuario_pelo_email(form_data.username)
+        usuario_autenticado = await usuario_service.obter_usuario_pelo_email(form_data.username)
 
         if usuario_autenticado:
             cache_key = f"user_profile:{usuario_autenticado.id}"
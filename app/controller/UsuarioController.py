@@ -2,14 +2,14 @@ import asyncio
 import logging
 import uuid
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db_session
+from app.db.database import get_async_db_session
 from app.db.redis.redis_cache import redis
 from app.models.autenticacao.login_schemas import ErrorResponse
 from app.models.usuarios import UsuarioSchemas
 from app.models.usuarios.UsuarioModel import Usuario
-from app.security.depends import get_current_user
+from app.security.depends import get_async_db_session_leitura, get_current_user
 from app.services.AutenticacaoService import verify_role
 from app.services.UsuarioService import UsuarioService
 
@@ -39,10 +39,10 @@ endpointUsuario = "/usuarios/"
     },
     dependencies=[Depends(verify_role("admin"))]
 )
-def obter_usuario_por_id(usuarioId: uuid.UUID, db: Session = Depends(get_db_session)):
+async def obter_usuario_por_id(usuarioId: uuid.UUID, db: AsyncSession = Depends(get_async_db_session_leitura)):
     logging.info(f"Recebida solicitação para obter usuário com ID: {usuarioId}")
     usuario_service = UsuarioService(db)
-    usuarioEncontrado = usuario_service.obter_usuario_pelo_id(usuarioId)
+    usuarioEncontrado = await usuario_service.obter_usuario_pelo_id(usuarioId)
     if not usuarioEncontrado:
         logging.warning(f"Usuário com ID {usuarioId} não encontrado.")
         raise HTTPException(status_code=404, detail="Usuário não encontrado.")
@@ -74,14 +74,14 @@ def obter_usuario_por_id(usuarioId: uuid.UUID, db: Session = Depends(get_db_sess
         },
     }
 )
-def obter_usuario_por_email(
+async def obter_usuario_por_email(
         usuarioEmail: str,
-        db: Session = Depends(get_db_session),
+        db: AsyncSession = Depends(get_async_db_session_leitura),
         current_user: Usuario = Depends(get_current_user)
 ):
     logging.info(f"Recebida solicitação para obter usuário com e-mail: {usuarioEmail}")
     usuario_service = UsuarioService(db)
-    usuarioEncontrado = usuario_service.obter_usuario_pelo_email(usuarioEmail)
+    usuarioEncontrado = await usuario_service.obter_usuario_pelo_email(usuarioEmail)
     if not usuarioEncontrado:
         logging.warning(f"Usuário com e-mail {usuarioEmail} não encontrado.")
         raise HTTPException(status_code=404, detail="Usuário não encontrado.")
@@ -110,11 +110,11 @@ def obter_usuario_por_email(
         },
     }
 )
-def criar_usuario(usuario: UsuarioSchemas.CreateUserRequest, db: Session = Depends(get_db_session)):
+async def criar_usuario(usuario: UsuarioSchemas.CreateUserRequest, db: AsyncSession = Depends(get_async_db_session)):
     logging.info("Recebida solicitação para criar um novo usuário.")
     usuario_service = UsuarioService(db)
     try:
-        usuario = usuario_service.criar_usuario(usuario)
+        usuario = await usuario_service.criar_usuario(usuario)
         logging.info(f"Usuário criado com sucesso: {usuario.email}")
         return usuario
     except ValueError as e:
@@ -153,14 +153,14 @@ def criar_usuario(usuario: UsuarioSchemas.CreateUserRequest, db: Session = Depen
 async def atualizar_usuario(
         usuario_id: uuid.UUID,
         usuario: UsuarioSchemas.UpdateUserRequest,
-        db: Session = Depends(get_db_session),
+        db: AsyncSession = Depends(get_async_db_session),
         current_user: Usuario = Depends(get_current_user),
 ):
     logging.info(f"Recebida solicitação para atualizar o usuário com ID: {usuario_id}")
     usuario_service = UsuarioService(db)
 
     try:
-        usuario_atualizado = usuario_service.atualizar_usuario(usuario_id, usuario)
+        usuario_atualizado = await usuario_service.atualizar_usuario(usuario_id, usuario)
 
         cache_key = f"user_profile:{usuario_id}"
         logging.info(f"Invalidando cache com chave: {cache_key}")
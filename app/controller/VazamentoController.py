@@ -1,16 +1,19 @@
 import logging
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+import httpx
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db_session
+from app.db.redis.rate_limiter import limitador_hibp
 from app.models.autenticacao.login_schemas import ErrorResponse
 from app.models.usuarios.UsuarioModel import Usuario
 from app.models.vazamentos import schemas
-from app.security.depends import get_current_user
+from app.security.depends import get_async_db_session_leitura, get_current_user
 from app.services.AutenticacaoService import verify_role
 from app.services.VazamentoService import VazamentoService
+from app.utils.HibpClient import obter_cliente_hibp
+from app.utils.Paginacao import PAGINACAO_LIMITE_MAXIMO, PAGINACAO_LIMITE_PADRAO
 
 from app.utils.VazamentoUtils import notificar_vazamento_usuario_por_email_demonstrativo
 
@@ -68,8 +71,9 @@ from fastapi import HTTPException, status
 )
 async def obter_vazamentos_do_usuario_por_email(
     email: str,
-    db: Session = Depends(get_db_session),
-    current_user: Usuario = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db_session_leitura),
+    current_user: Usuario = Depends(get_current_user),
+    cliente_hibp: httpx.AsyncClient = Depends(obter_cliente_hibp)
 ):
     logging.info(f"Requisição recebida para buscar vazamentos do usuário com e-mail: {email}")
 
@@ -80,7 +84,7 @@ async def obter_vazamentos_do_usuario_por_email(
             detail="Você não tem permissão para acessar os vazamentos deste usuário."
         )
 
-    vazamento_service = VazamentoService(db)
+    vazamento_service = VazamentoService(db, cliente_hibp)
 
     try:
         vazamentoEncontrado = await vazamento_service.obter_vazamentos_pelo_email_usuario_e_salva_no_db(email)
@@ -120,21 +124,78 @@ async def obter_vazamentos_do_usuario_por_email(
         )
 
 
-"""@router.get(endpointVazamento + "exporvazamentos/", response_model=List[schemas.VazamentoResponse])
-def expor_vazamentos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db_session)):
-    logging.info(f"Requisição recebida para expor vazamentos com paginação (skip: {skip}, limit: {limit})")
+@router.get(
+    endpointVazamento + "procurar/{email}/classes-de-dados",
+    response_model=List[schemas.VazamentoResponse],
+    summary="Filtrar vazamentos do usuário por classe de dados",
+    description=(
+        "Retorna os vazamentos já registrados para o e-mail que expõem todas as classes de dados "
+        "informadas, por exemplo `?classe=Passwords`. Apenas o próprio usuário pode acessar seus vazamentos."
+    ),
+    tags=["Vazamentos"],
+    responses={
+        403: {
+            "description": "Permissão negada. O usuário não pode acessar vazamentos de outro e-mail.",
+            "model": ErrorResponse,
+        },
+    }
+)
+async def obter_vazamentos_do_usuario_por_classe_de_dados(
+    email: str,
+    classe: List[str] = Query(..., min_length=1, description="Classes de dados expostas, ex.: Passwords"),
+    db: AsyncSession = Depends(get_async_db_session_leitura),
+    current_user: Usuario = Depends(get_current_user),
+):
+    logging.info(f"Requisição recebida para filtrar vazamentos do usuário {email} pelas classes {classe}")
 
-    vazamento_service = VazamentoService(db)
-    try:
-        vazamentos = vazamento_service.get_all_vazamentos(skip, limit)
-        if not vazamentos:
-            logging.warning(f"Nenhum vazamento encontrado na paginação (skip: {skip}, limit: {limit})")
-            raise HTTPException(status_code=404, detail="Nenhum vazamento encontrado")
-        logging.info(f"{len(vazamentos)} vazamentos encontrados.")
-        return vazamentos
-    except Exception as e:
-        logging.error(f"Erro ao expor vazamentos: {e}")
-        raise HTTPException(status_code=500, detail="Erro ao expor vazamentos") """
+    if current_user.email != email:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Você não tem permissão para acessar os vazamentos deste usuário."
+        )
+
+    return await VazamentoService(db).buscar_vazamentos_por_classes_de_dados(current_user.id, classe)
+
+
+@router.get(
+    endpointVazamento + "hibp/limite-requisicoes",
+    summary="Métricas do limitador de requisições da API HIBP",
+    description=(
+        "Retorna a profundidade da fila, o tempo de espera e as respostas 429 do limitador "
+        "compartilhado da API Have I Been Pwned. Usado para dimensionar o plano da chave de API."
+    ),
+    tags=["Vazamentos"],
+    response_model=dict,
+    dependencies=[Depends(verify_role("admin"))]
+)
+async def obter_metricas_limite_hibp():
+    return await limitador_hibp.obter_metricas()
+
+
+@router.get(
+    endpointVazamento + "meus",
+    response_model=schemas.PaginaVazamentos,
+    summary="Listar os vazamentos do usuário autenticado",
+    description=(
+        "Retorna uma página dos vazamentos já registrados para o usuário autenticado, do detectado mais "
+        "recentemente para o mais antigo. Para obter a próxima página, envie o `proximo_cursor` da resposta em `cursor`."
+    ),
+    tags=["Vazamentos"],
+    responses={
+        400: {
+            "description": "Cursor de paginação inválido.",
+            "model": ErrorResponse,
+        },
+    }
+)
+async def listar_vazamentos_do_usuario(
+    limite: int = Query(PAGINACAO_LIMITE_PADRAO, ge=1, le=PAGINACAO_LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db_session_leitura),
+    current_user: Usuario = Depends(get_current_user),
+):
+    logging.info(f"Requisição recebida para listar os vazamentos do usuário {current_user.email} (limite: {limite})")
+    return await VazamentoService(db).listar_vazamentos_do_usuario(current_user.id, limite, cursor)
 
 
 @router.post(
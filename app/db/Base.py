@@ -1,4 +1,6 @@
 from sqlalchemy.orm import declarative_base
 from app.models.usuarios import UsuarioModel  # Importe seus modelos aqui
 from app.models.vazamentos import models   # Importe seus modelos aqui
+from app.models.automacoes import models as automacoes_models   # Importe seus modelos aqui
+from app.models.emails import models as emails_models   # Importe seus modelos aqui
 
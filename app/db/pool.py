@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Por processo: com N workers do uvicorn, o banco recebe até N * (tamanho + overflow) conexões por engine.
+DB_POOL_TAMANHO = int(os.getenv("DB_POOL_TAMANHO", "5"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recicla conexões antigas antes que o servidor ou um balanceador as encerre.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Testa a conexão antes de usá-la, descartando as que morreram em um restart do Postgres.
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# PgBouncer em modo transaction: desativa o cache de prepared statements do asyncpg.
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+
+class MetricasPool:
+    """
+    Contadores de um pool de conexões neste processo.
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.checkouts = 0
+        self.espera_total_segundos = 0.0
+        self.espera_maxima_segundos = 0.0
+        self.timeouts = 0
+        self.conexoes_criadas = 0
+        self.conexoes_invalidadas = 0
+        self._lock = threading.Lock()
+
+    def registrar_checkout(self, espera: float):
+        with self._lock:
+            self.checkouts += 1
+            self.espera_total_segundos += espera
+            self.espera_maxima_segundos = max(self.espera_maxima_segundos, espera)
+
+    def registrar_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+
+class _MedirEsperaMixin:
+    metricas: MetricasPool
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except PoolTimeoutError:
+            self.metricas.registrar_timeout()
+            logging.warning(f"Tempo esgotado aguardando uma conexão do pool {self.metricas.nome}.")
+            raise
+        self.metricas.registrar_checkout(time.perf_counter() - inicio)
+        return conexao
+
+
+_pools: dict[str, tuple[MetricasPool, Engine]] = {}
+
+
+def classe_de_pool(nome: str, assincrono: bool) -> type:
+    """
+    Classe de pool que mede o tempo de espera por conexão. As métricas ficam na classe para
+    sobreviver a `Pool.recreate()`, usado pelo SQLAlchemy após falhas de conexão.
+    """
+    base = AsyncAdaptedQueuePool if assincrono else QueuePool
+    return type(f"{base.__name__}Instrumentado", (_MedirEsperaMixin, base), {"metricas": MetricasPool(nome)})
+
+
+def opcoes_de_pool(nome: str, assincrono: bool = False) -> dict:
+    return {
+        "poolclass": classe_de_pool(nome, assincrono),
+        "pool_size": DB_POOL_TAMANHO,
+        "max_overflow": DB_POOL_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def url_asyncpg(url: str | URL) -> URL:
+    url = make_url(url)
+    if DB_PGBOUNCER:
+        url = url.update_query_dict({"prepared_statement_cache_size": "0"})
+    return url
+
+
+def argumentos_de_conexao_asyncpg() -> dict:
+    if not DB_PGBOUNCER:
+        return {}
+    # Em modo transaction cada comando pode ir para outro servidor: sem cache e com nomes únicos.
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
+
+def registrar_pool(nome: str, engine: Engine):
+    """
+    Registra o engine (síncrono, ou o `sync_engine` de um AsyncEngine) para as métricas de pool.
+    """
+    metricas = engine.pool.metricas
+
+    @event.listens_for(engine, "connect")
+    def _ao_conectar(conexao_dbapi, registro):
+        metricas.conexoes_criadas += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _ao_invalidar(conexao_dbapi, registro, excecao):
+        metricas.conexoes_invalidadas += 1
+
+    _pools[nome] = (metricas, engine)
+
+
+def obter_metricas_pool() -> dict:
+    """
+    Estado e contadores de cada pool deste processo: conexões em uso, overflow, checkouts,
+    tempo de espera por conexão e timeouts.
+    """
+    resposta = {}
+    for nome, (metricas, engine) in _pools.items():
+        pool = engine.pool
+        resposta[nome] = {
+            "tamanho": pool.size(),
+            "em_uso": pool.checkedout(),
+            "disponiveis": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": DB_POOL_MAX_OVERFLOW,
+            "checkouts": metricas.checkouts,
+            "espera_media_ms": round(metricas.espera_total_segundos * 1000 / metricas.checkouts, 2)
+            if metricas.checkouts else 0.0,
+            "espera_maxima_ms": round(metricas.espera_maxima_segundos * 1000, 2),
+            "timeouts": metricas.timeouts,
+            "conexoes_criadas": metricas.conexoes_criadas,
+            "conexoes_invalidadas": metricas.conexoes_invalidadas,
+        }
+    return {
+        "processo": os.getpid(),
+        "configuracao": {
+            "tamanho": DB_POOL_TAMANHO,
+            "max_overflow": DB_POOL_MAX_OVERFLOW,
+            "timeout_segundos": DB_POOL_TIMEOUT,
+            "recycle_segundos": DB_POOL_RECYCLE,
+            "pre_ping": DB_POOL_PRE_PING,
+            "pgbouncer": DB_PGBOUNCER,
+        },
+        "pools": resposta,
+    }
@@ -0,0 +1,93 @@
+import functools
+import logging
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable
+
+from redis.exceptions import RedisError
+
+from app.db.redis.redis_cache import redis
+
+AGENDADOR_LIDER_TTL_SEGUNDOS = int(os.getenv("AGENDADOR_LIDER_TTL_SEGUNDOS", "30"))
+# A liderança é renovada várias vezes dentro do TTL para tolerar atrasos pontuais.
+AGENDADOR_LIDER_INTERVALO_RENOVACAO = max(1, AGENDADOR_LIDER_TTL_SEGUNDOS // 3)
+
+# Renova o TTL apenas se a chave ainda pertence a este processo.
+_SCRIPT_RENOVAR = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_SCRIPT_LIBERAR = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class EleicaoLider:
+    """
+    Eleição de líder entre processos por meio de uma chave no Redis com TTL.
+    O líder renova a chave periodicamente; se ele morrer, a chave expira e outro
+    processo assume na próxima renovação.
+    """
+
+    def __init__(self, nome: str, ttl_segundos: int):
+        self.chave = f"lider:{nome}"
+        self.ttl_ms = ttl_segundos * 1000
+        self.identificador = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lider = False
+        self._renovar = redis.register_script(_SCRIPT_RENOVAR)
+        self._liberar = redis.register_script(_SCRIPT_LIBERAR)
+
+    async def renovar(self) -> bool:
+        """
+        Renova a liderança deste processo ou tenta assumi-la. Retorna se este processo é o líder.
+        """
+        try:
+            lider = bool(await self._renovar(keys=[self.chave], args=[self.identificador, self.ttl_ms]))
+            if not lider:
+                lider = bool(await redis.set(self.chave, self.identificador, nx=True, px=self.ttl_ms))
+        except RedisError as e:
+            # Sem o Redis não é possível garantir a exclusividade; o processo deixa de ser líder.
+            logging.error(f"Erro ao renovar a liderança de {self.chave}: {e}")
+            lider = False
+
+        if lider and not self.lider:
+            logging.info(f"Processo {self.identificador} assumiu a liderança de {self.chave}.")
+        elif self.lider and not lider:
+            logging.warning(f"Processo {self.identificador} perdeu a liderança de {self.chave}.")
+        self.lider = lider
+        return lider
+
+    async def liberar(self):
+        if not self.lider:
+            return
+        try:
+            await self._liberar(keys=[self.chave], args=[self.identificador])
+            logging.info(f"Processo {self.identificador} liberou a liderança de {self.chave}.")
+        except RedisError as e:
+            logging.error(f"Erro ao liberar a liderança de {self.chave}: {e}")
+        self.lider = False
+
+
+eleicao_agendador = EleicaoLider("agendador", AGENDADOR_LIDER_TTL_SEGUNDOS)
+
+
+def somente_lider(funcao: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+    """
+    Envolve uma tarefa agendada para que apenas o processo líder a execute.
+    A liderança é confirmada no Redis imediatamente antes da execução.
+    """
+    @functools.wraps(funcao)
+    async def executar():
+        if not await eleicao_agendador.renovar():
+            logging.info(f"Tarefa {funcao.__name__} ignorada: este processo não é o líder do agendador.")
+            return
+        await funcao()
+
+    return executar
@@ -0,0 +1,136 @@
+import logging
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from app.db.redis.redis_cache import redis
+
+# Métricas ficam no Redis enquanto a execução é consultada; a execução concluída também as grava no banco.
+METRICAS_TTL_SEGUNDOS = int(os.getenv("METRICAS_TTL_SEGUNDOS", str(30 * 24 * 3600)))
+
+# Limites superiores (ms) dos intervalos do histograma de latência da API HIBP.
+LIMITES_LATENCIA_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+PERCENTIS = (50, 90, 95, 99)
+
+_metricas_atuais: ContextVar[Optional["MetricasExecucao"]] = ContextVar("metricas_execucao", default=None)
+
+
+class MetricasExecucao:
+    """
+    Contadores de uma execução da automação agregados no Redis, para que todos os processos
+    que participam da execução somem nas mesmas métricas.
+    """
+
+    def __init__(self, chave: str):
+        self.chave = chave
+        self._chave_redis = f"automacao:metricas:{chave}"
+
+    async def incrementar(self, campo: str, valor: float = 1):
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                if isinstance(valor, int):
+                    pipe.hincrby(self._chave_redis, campo, valor)
+                else:
+                    pipe.hincrbyfloat(self._chave_redis, campo, valor)
+                pipe.expire(self._chave_redis, METRICAS_TTL_SEGUNDOS)
+                await pipe.execute()
+        except RedisError as e:
+            # Métricas nunca interrompem a automação.
+            logging.warning(f"Erro ao registrar a métrica {campo} de {self.chave}: {e}")
+
+    async def registrar_latencia_hibp(self, segundos: float):
+        latencia_ms = segundos * 1000
+        limite = next((limite for limite in LIMITES_LATENCIA_MS if latencia_ms <= limite), "inf")
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hincrby(self._chave_redis, "hibp_chamadas", 1)
+                pipe.hincrbyfloat(self._chave_redis, "hibp_latencia_total_segundos", segundos)
+                pipe.hincrby(self._chave_redis, f"hibp_latencia_ms_ate:{limite}", 1)
+                pipe.expire(self._chave_redis, METRICAS_TTL_SEGUNDOS)
+                await pipe.execute()
+        except RedisError as e:
+            logging.warning(f"Erro ao registrar a latência da HIBP de {self.chave}: {e}")
+
+    @asynccontextmanager
+    async def fase(self, nome: str):
+        """
+        Soma o tempo de relógio gasto no bloco à fase `nome`. Com vários processos,
+        o tempo das fases paralelas é somado entre eles.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            await self.incrementar(f"fase:{nome}:segundos", time.perf_counter() - inicio)
+
+    async def obter(self) -> Optional[dict]:
+        valores = await redis.hgetall(self._chave_redis)
+        if not valores:
+            return None
+        return _montar_metricas({chave.decode(): float(valor) for chave, valor in valores.items()})
+
+
+def _montar_metricas(valores: dict[str, float]) -> dict:
+    metricas: dict = {"fases_segundos": {}}
+    histograma = {}
+    for campo, valor in valores.items():
+        if campo.startswith("fase:"):
+            metricas["fases_segundos"][campo.split(":")[1]] = round(valor, 3)
+        elif campo.startswith("hibp_latencia_ms_ate:"):
+            histograma[campo.split(":")[1]] = int(valor)
+        elif campo.endswith("_segundos"):
+            metricas[campo] = round(valor, 3)
+        else:
+            metricas[campo] = int(valor)
+
+    chamadas = metricas.get("hibp_chamadas", 0)
+    if chamadas:
+        metricas["hibp_latencia_media_ms"] = round(metricas.pop("hibp_latencia_total_segundos", 0) * 1000 / chamadas, 1)
+        metricas["hibp_latencia_percentis_ms"] = _calcular_percentis(histograma, chamadas)
+    return metricas
+
+
+def _calcular_percentis(histograma: dict[str, int], total: int) -> dict[str, Optional[int]]:
+    """
+    Percentis aproximados pelo limite superior do intervalo do histograma (None = acima do maior limite).
+    """
+    percentis = {}
+    acumulado = 0
+    limites = [str(limite) for limite in LIMITES_LATENCIA_MS] + ["inf"]
+    pendentes = list(PERCENTIS)
+    for limite in limites:
+        acumulado += histograma.get(limite, 0)
+        while pendentes and acumulado >= total * pendentes[0] / 100:
+            percentis[f"p{pendentes.pop(0)}"] = None if limite == "inf" else int(limite)
+    return percentis
+
+
+def metricas_atuais() -> Optional[MetricasExecucao]:
+    return _metricas_atuais.get()
+
+
+@contextmanager
+def usar_metricas(chave: str):
+    """
+    Associa as métricas `chave` ao contexto atual. Tarefas asyncio criadas dentro do bloco
+    herdam o contexto e registram nas mesmas métricas.
+    """
+    token = _metricas_atuais.set(MetricasExecucao(chave))
+    try:
+        yield _metricas_atuais.get()
+    finally:
+        _metricas_atuais.reset(token)
+
+
+async def incrementar_metrica(campo: str, valor: float = 1, chave: Optional[str] = None):
+    """
+    Incrementa `campo` nas métricas do contexto atual ou, com `chave`, nas métricas indicadas.
+    Sem métricas associadas (ex.: consultas feitas pela API), não faz nada.
+    """
+    metricas = MetricasExecucao(chave) if chave else metricas_atuais()
+    if metricas is not None:
+        await metricas.incrementar(campo, valor)
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+from app.db.redis.redis_cache import redis
+
+HIBP_REQUISICOES_POR_MINUTO = int(os.getenv("HIBP_REQUISICOES_POR_MINUTO", "10"))
+HIBP_RAJADA_MAXIMA = int(os.getenv("HIBP_RAJADA_MAXIMA", "1"))
+
+# Token bucket atômico no Redis. Usa o relógio do próprio Redis para que todos os workers
+# (uvicorn e agendador) compartilhem o mesmo balde sem depender do horário de cada máquina.
+# Retorna 0 quando um token foi consumido ou o tempo de espera (ms) até o próximo token.
+_SCRIPT_TOKEN_BUCKET = """
+local bloqueio = redis.call('PTTL', KEYS[2])
+if bloqueio > 0 then
+    return bloqueio
+end
+
+local capacidade = tonumber(ARGV[1])
+local taxa_por_ms = tonumber(ARGV[2])
+local tempo = redis.call('TIME')
+local agora = tonumber(tempo[1]) * 1000 + math.floor(tonumber(tempo[2]) / 1000)
+
+local dados = redis.call('HMGET', KEYS[1], 'tokens', 'atualizado_em')
+local tokens = tonumber(dados[1]) or capacidade
+local atualizado_em = tonumber(dados[2]) or agora
+tokens = math.min(capacidade, tokens + math.max(0, agora - atualizado_em) * taxa_por_ms)
+
+local espera = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    espera = math.ceil((1 - tokens) / taxa_por_ms)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'atualizado_em', agora)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacidade / taxa_por_ms) * 2)
+return espera
+"""
+
+# Fila de espera como um sorted set de participantes com validade (score em ms no relógio do Redis).
+# Quem aguarda renova a própria validade a cada tentativa; a entrada de um processo que morreu
+# expira sozinha em vez de ficar contada para sempre. Sem participante (ARGV[1] vazio), só conta.
+_SCRIPT_FILA = """
+local tempo = redis.call('TIME')
+local agora = tonumber(tempo[1]) * 1000 + math.floor(tonumber(tempo[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', agora)
+
+local validade_ms = tonumber(ARGV[2])
+if ARGV[1] ~= '' then
+    redis.call('ZADD', KEYS[1], agora + validade_ms, ARGV[1])
+    if redis.call('PTTL', KEYS[1]) < validade_ms then
+        redis.call('PEXPIRE', KEYS[1], validade_ms)
+    end
+end
+return redis.call('ZCARD', KEYS[1])
+"""
+
+# Métricas de espera atualizadas atomicamente, inclusive o máximo (sem corrida entre leitura e escrita).
+# ARGV[2] indica se o balde mandou esperar; o tempo medido inclui a ida ao Redis e não serve para isso.
+_SCRIPT_REGISTRAR_ESPERA = """
+local espera = tonumber(ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'tokens_concedidos', 1)
+redis.call('HINCRBY', KEYS[1], 'espera_total_ms', espera)
+if ARGV[2] == '1' then
+    redis.call('HINCRBY', KEYS[1], 'requisicoes_com_espera', 1)
+end
+local maxima = tonumber(redis.call('HGET', KEYS[1], 'espera_maxima_ms'))
+if maxima == nil or espera > maxima then
+    redis.call('HSET', KEYS[1], 'espera_maxima_ms', espera)
+end
+"""
+
+# Folga somada à espera informada pelo balde antes que a entrada de quem aguarda expire.
+_FOLGA_VALIDADE_FILA_MS = 5000
+
+
+class LimitadorDeTaxa:
+    """
+    Limitador de requisições (token bucket) compartilhado entre processos via Redis.
+    Quem chama `aguardar_token` espera até existir um token disponível em vez de falhar.
+    """
+
+    def __init__(self, nome: str, requisicoes_por_minuto: int, rajada_maxima: int = 1):
+        if requisicoes_por_minuto <= 0:
+            raise ValueError(f"O limite '{nome}' precisa de um número positivo de requisições por minuto.")
+        self.nome = nome
+        self.capacidade = max(1, rajada_maxima)
+        self.taxa_por_ms = requisicoes_por_minuto / 60000
+        self.chave_bucket = f"ratelimit:{nome}:bucket"
+        self.chave_bloqueio = f"ratelimit:{nome}:bloqueio"
+        # Chave nova (sorted set); a antiga ":fila" era um contador e pode continuar no Redis.
+        self.chave_fila = f"ratelimit:{nome}:aguardando"
+        self.chave_metricas = f"ratelimit:{nome}:metricas"
+        self._script = redis.register_script(_SCRIPT_TOKEN_BUCKET)
+        self._script_fila = redis.register_script(_SCRIPT_FILA)
+        self._script_registrar_espera = redis.register_script(_SCRIPT_REGISTRAR_ESPERA)
+
+    async def aguardar_token(self) -> float:
+        """
+        Aguarda até conseguir um token. Retorna o tempo total de espera em segundos.
+        """
+        inicio = time.monotonic()
+        participante = None
+        try:
+            while True:
+                espera_ms = int(await self._script(
+                    keys=[self.chave_bucket, self.chave_bloqueio],
+                    args=[self.capacidade, self.taxa_por_ms],
+                ))
+                if espera_ms <= 0:
+                    break
+                primeira_espera = participante is None
+                participante = participante or uuid.uuid4().hex
+                # Entra na fila ou renova a validade da própria entrada a cada espera.
+                profundidade = await self._script_fila(
+                    keys=[self.chave_fila], args=[participante, espera_ms + _FOLGA_VALIDADE_FILA_MS]
+                )
+                if primeira_espera:
+                    logging.info(
+                        f"Limite de requisições '{self.nome}' atingido. Aguardando {espera_ms} ms "
+                        f"({profundidade} na fila)."
+                    )
+                await asyncio.sleep(espera_ms / 1000)
+        finally:
+            if participante:
+                await redis.zrem(self.chave_fila, participante)
+
+        tempo_espera = time.monotonic() - inicio
+        await self._registrar_espera(tempo_espera, esperou=participante is not None)
+        return tempo_espera
+
+    async def aplicar_retry_after(self, segundos: float):
+        """
+        Bloqueia o consumo de tokens em todos os processos pelo tempo indicado no Retry-After.
+        """
+        milissegundos = max(1, int(segundos * 1000))
+        await redis.set(self.chave_bloqueio, 1, px=milissegundos)
+        await redis.hincrby(self.chave_metricas, "respostas_429", 1)
+        logging.warning(f"Limite '{self.nome}' bloqueado por {segundos}s após resposta 429 (Retry-After).")
+
+    async def _registrar_espera(self, tempo_espera: float, esperou: bool):
+        await self._script_registrar_espera(
+            keys=[self.chave_metricas], args=[int(tempo_espera * 1000), 1 if esperou else 0]
+        )
+
+    async def obter_metricas(self) -> dict:
+        metricas = await redis.hgetall(self.chave_metricas)
+        profundidade_fila = await self._script_fila(keys=[self.chave_fila], args=["", 0])
+        bloqueio_ms = await redis.pttl(self.chave_bloqueio)
+
+        metricas = {chave.decode(): int(valor) for chave, valor in metricas.items()}
+        tokens_concedidos = metricas.get("tokens_concedidos", 0)
+        return {
+            "limite": self.nome,
+            "requisicoes_por_minuto": round(self.taxa_por_ms * 60000),
+            "rajada_maxima": self.capacidade,
+            "profundidade_fila": int(profundidade_fila),
+            "bloqueado_por_ms": max(0, bloqueio_ms),
+            "tokens_concedidos": tokens_concedidos,
+            "requisicoes_com_espera": metricas.get("requisicoes_com_espera", 0),
+            "respostas_429": metricas.get("respostas_429", 0),
+            "espera_media_ms": metricas.get("espera_total_ms", 0) / tokens_concedidos if tokens_concedidos else 0,
+            "espera_maxima_ms": metricas.get("espera_maxima_ms", 0),
+        }
+
+
+limitador_hibp = LimitadorDeTaxa("hibp", HIBP_REQUISICOES_POR_MINUTO, HIBP_RAJADA_MAXIMA)
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, TypeVar
+
+from redis.exceptions import LockError
+
+from app.db.redis.redis_cache import redis
+
+# O lock é renovado enquanto a execução dura (ex.: na fila do limitador da HIBP), então o TTL
+# só precisa cobrir o intervalo entre renovações; ele limita o bloqueio deixado por um processo morto.
+SINGLE_FLIGHT_TTL = int(os.getenv("SINGLE_FLIGHT_TTL", "60"))
+SINGLE_FLIGHT_ESPERA_MAXIMA = int(os.getenv("SINGLE_FLIGHT_ESPERA_MAXIMA", "30"))
+
+T = TypeVar("T")
+
+_em_andamento: dict[str, asyncio.Future] = {}
+
+
+async def executar_uma_vez(chave: str, funcao: Callable[[], Awaitable[T]]) -> T:
+    """
+    Garante que apenas uma execução de `funcao` ocorra por vez para a mesma chave.
+    No mesmo processo, chamadas concorrentes aguardam o resultado da execução em andamento.
+    Entre processos, a execução é protegida por um lock no Redis; quem aguarda o lock executa
+    `funcao` em seguida, por isso ela deve verificar se o trabalho já foi feito.
+    """
+    futuro = _em_andamento.get(chave)
+    if futuro is not None:
+        logging.info(f"Aguardando execução em andamento para a chave: {chave}")
+        return await asyncio.shield(futuro)
+
+    futuro = asyncio.get_running_loop().create_future()
+    _em_andamento[chave] = futuro
+    try:
+        resultado = await _executar_com_lock(chave, funcao)
+        futuro.set_result(resultado)
+        return resultado
+    except asyncio.CancelledError:
+        futuro.cancel()
+        raise
+    except Exception as e:
+        futuro.set_exception(e)
+        # Evita o aviso "exception was never retrieved" quando ninguém mais aguardava.
+        futuro.exception()
+        raise
+    finally:
+        _em_andamento.pop(chave, None)
+
+
+async def _executar_com_lock(chave: str, funcao: Callable[[], Awaitable[T]]) -> T:
+    lock = redis.lock(
+        f"singleflight:{chave}",
+        timeout=SINGLE_FLIGHT_TTL,
+        blocking_timeout=SINGLE_FLIGHT_ESPERA_MAXIMA,
+    )
+    adquirido = await lock.acquire()
+    if not adquirido:
+        logging.warning(f"Tempo esgotado aguardando o lock da chave {chave}. Executando sem coordenação.")
+
+    renovacao = asyncio.create_task(_renovar_lock(lock, chave)) if adquirido else None
+    try:
+        return await funcao()
+    finally:
+        if renovacao:
+            renovacao.cancel()
+        if adquirido:
+            try:
+                await lock.release()
+            except LockError:
+                logging.warning(f"O lock da chave {chave} expirou antes do fim da execução.")
+
+
+async def _renovar_lock(lock, chave: str):
+    """
+    Renova o TTL do lock a cada terço do TTL enquanto a execução não termina.
+    """
+    while True:
+        await asyncio.sleep(SINGLE_FLIGHT_TTL / 3)
+        try:
+            await lock.reacquire()
+        except LockError:
+            logging.warning(f"Não foi possível renovar o lock da chave {chave}; ele já expirou.")
+            return
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import os
+import random
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from app.db.database import AsyncSessionLeitura
+from app.db.pool import argumentos_de_conexao_asyncpg, opcoes_de_pool, registrar_pool, url_asyncpg
+from app.db.redis.redis_cache import redis
+
+# Uma ou mais réplicas de leitura, separadas por vírgula. Sem réplicas, tudo vai para o primário.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+# Réplicas mais atrasadas que isso deixam de receber leituras até alcançarem o primário.
+REPLICA_ATRASO_MAXIMO_SEGUNDOS = float(os.getenv("REPLICA_ATRASO_MAXIMO_SEGUNDOS", "5"))
+REPLICA_INTERVALO_VERIFICACAO_SEGUNDOS = float(os.getenv("REPLICA_INTERVALO_VERIFICACAO_SEGUNDOS", "5"))
+# Depois de uma escrita, as leituras do usuário vão para o primário por esse tempo (ler o que escreveu).
+# Deve ser maior que o atraso máximo somado ao intervalo de verificação.
+LEITURA_APOS_ESCRITA_SEGUNDOS = int(os.getenv("LEITURA_APOS_ESCRITA_SEGUNDOS", "30"))
+
+# Réplica em dia quando tudo o que recebeu já foi aplicado; senão, idade da última transação aplicada.
+_SQL_ATRASO = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+class Replica:
+    def __init__(self, nome: str, url: str):
+        self.nome = nome
+        self.engine: AsyncEngine = create_async_engine(
+            url_asyncpg(make_url(url).set(drivername="postgresql+asyncpg")),
+            connect_args=argumentos_de_conexao_asyncpg(),
+            **opcoes_de_pool(nome, assincrono=True),
+        )
+        registrar_pool(nome, self.engine.sync_engine)
+        self.atraso_segundos: Optional[float] = None
+        # Só recebe leituras depois da primeira verificação de atraso bem-sucedida.
+        self.disponivel = False
+        self.ultimo_erro: Optional[str] = None
+
+    async def verificar_atraso(self):
+        try:
+            async with self.engine.connect() as conexao:
+                atraso = await conexao.scalar(text(_SQL_ATRASO))
+            self.atraso_segundos = float(atraso) if atraso is not None else None
+            self.ultimo_erro = None
+        except Exception as e:
+            self.atraso_segundos = None
+            self.ultimo_erro = str(e)
+
+        disponivel = self.atraso_segundos is not None and self.atraso_segundos <= REPLICA_ATRASO_MAXIMO_SEGUNDOS
+        if disponivel != self.disponivel:
+            if disponivel:
+                logging.info(f"Réplica {self.nome} voltou a receber leituras (atraso: {self.atraso_segundos}s).")
+            else:
+                logging.warning(
+                    f"Réplica {self.nome} excluída das leituras "
+                    f"(atraso: {self.atraso_segundos}s, erro: {self.ultimo_erro})."
+                )
+        self.disponivel = disponivel
+
+
+replicas = [
+    Replica(f"replica_{numero}", url.strip())
+    for numero, url in enumerate(DATABASE_REPLICA_URL.split(","), start=1)
+    if url.strip()
+]
+
+_tarefa_monitoramento: Optional[asyncio.Task] = None
+
+
+async def verificar_replicas():
+    await asyncio.gather(*(replica.verificar_atraso() for replica in replicas))
+
+
+async def _monitorar_replicas():
+    while True:
+        await asyncio.sleep(REPLICA_INTERVALO_VERIFICACAO_SEGUNDOS)
+        await verificar_replicas()
+
+
+async def iniciar_monitoramento_replicas():
+    """
+    Verifica o atraso das réplicas agora e depois periodicamente, em segundo plano.
+    """
+    global _tarefa_monitoramento
+    if not replicas:
+        return
+    await verificar_replicas()
+    _tarefa_monitoramento = asyncio.create_task(_monitorar_replicas())
+    logging.info(f"Monitoramento de {len(replicas)} réplica(s) de leitura iniciado.")
+
+
+async def encerrar_replicas():
+    global _tarefa_monitoramento
+    if _tarefa_monitoramento:
+        _tarefa_monitoramento.cancel()
+        _tarefa_monitoramento = None
+    for replica in replicas:
+        await replica.engine.dispose()
+
+
+def _chave_escrita_recente(usuario_id: uuid.UUID) -> str:
+    # Pelo id, e não pelo e-mail, para que uma troca de e-mail não desfaça a marcação.
+    return f"banco:escrita_recente:{usuario_id}"
+
+
+async def registrar_escrita(*usuario_ids: uuid.UUID):
+    """
+    Marca que o usuário acabou de escrever: por LEITURA_APOS_ESCRITA_SEGUNDOS, as leituras
+    dele vão para o primário e enxergam a escrita mesmo que as réplicas estejam atrasadas.
+    """
+    if not replicas:
+        return
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for usuario_id in usuario_ids:
+                pipe.set(_chave_escrita_recente(usuario_id), 1, ex=LEITURA_APOS_ESCRITA_SEGUNDOS)
+            await pipe.execute()
+    except RedisError as e:
+        logging.warning(f"Erro ao registrar a escrita recente de {usuario_ids}: {e}")
+
+
+async def escolher_replica(usuario_id: Optional[uuid.UUID] = None) -> Optional[Engine]:
+    """
+    Escolhe uma réplica disponível para as leituras de uma sessão. Retorna None (usar o primário)
+    quando não há réplica em dia ou quando o usuário escreveu recentemente.
+    """
+    disponiveis = [replica for replica in replicas if replica.disponivel]
+    if not disponiveis:
+        return None
+    if usuario_id:
+        try:
+            if await redis.exists(_chave_escrita_recente(usuario_id)):
+                return None
+        except RedisError as e:
+            logging.warning(f"Erro ao consultar a escrita recente de {usuario_id}, usando o primário: {e}")
+            return None
+    return random.choice(disponiveis).engine.sync_engine
+
+
+@asynccontextmanager
+async def sessao_de_leitura(usuario_id: Optional[uuid.UUID] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Sessão para leituras que toleram o atraso das réplicas. Sem réplica disponível, ou logo após
+    uma escrita do usuário, usa o primário.
+    """
+    async with AsyncSessionLeitura() as session:
+        session.sync_session.replica = await escolher_replica(usuario_id)
+        yield session
+
+
+def obter_estado_replicas() -> dict:
+    return {
+        "atraso_maximo_segundos": REPLICA_ATRASO_MAXIMO_SEGUNDOS,
+        "leitura_apos_escrita_segundos": LEITURA_APOS_ESCRITA_SEGUNDOS,
+        "replicas": [
+            {
+                "nome": replica.nome,
+                "disponivel": replica.disponivel,
+                "atraso_segundos": replica.atraso_segundos,
+                "ultimo_erro": replica.ultimo_erro,
+            }
+            for replica in replicas
+        ],
+    }
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, UniqueConstraint, Index, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import relationship
+
+from app.db.database import Base
+
+
+class ExecucaoAutomacao(Base):
+    """
+    Registro persistente de uma execução da automação de notificação de vazamentos.
+    Os usuários da execução são divididos em shards processados por um ou mais workers.
+    """
+    __tablename__ = "execucoes_automacao"
+    # Apenas uma execução em andamento por vez, mesmo com vários processos iniciando a automação.
+    __table_args__ = (
+        Index("uq_execucao_em_andamento", "status", unique=True, postgresql_where=text("status = 'em_andamento'")),
+    )
+    id = Column(Integer, primary_key=True)
+    status = Column(String, nullable=False, default="em_andamento")
+    iniciada_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finalizada_em = Column(DateTime, nullable=True)
+    total_shards = Column(Integer, nullable=False)
+    # Início da última execução bem-sucedida (None = primeira execução). Sem publicações no catálogo
+    # desde essa data a varredura é ignorada; com publicações, todo usuário não verificado depois da
+    # mais recente é consultado de novo e notificado de todos os vazamentos que a HIBP retornar.
+    novidades_desde = Column(DateTime, nullable=True)
+    # Métricas agregadas (chamadas e latência da HIBP, vazamentos, e-mails, tempo por fase), gravadas ao concluir.
+    metricas = Column(JSONB, nullable=True)
+    shards = relationship("ShardExecucao", back_populates="execucao")
+
+
+class ShardExecucao(Base):
+    """
+    Faixa de IDs de usuários de uma execução. O worker que detém o lease processa a faixa
+    e grava o último usuário concluído como checkpoint para retomada.
+    """
+    __tablename__ = "shards_execucao"
+    __table_args__ = (UniqueConstraint("execucao_id", "numero", name="uq_shard_execucao_numero"),)
+    id = Column(Integer, primary_key=True)
+    execucao_id = Column(Integer, ForeignKey("execucoes_automacao.id"), nullable=False)
+    numero = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="pendente")
+    ultimo_usuario_id = Column(UUID(as_uuid=True), nullable=True)
+    usuarios_processados = Column(Integer, nullable=False, default=0)
+    falhas = Column(Integer, nullable=False, default=0)
+    dono_lease = Column(String, nullable=True)
+    lease_expira_em = Column(DateTime, nullable=True)
+    atualizado_em = Column(DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+    execucao = relationship("ExecucaoAutomacao", back_populates="shards")
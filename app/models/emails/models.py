@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index, text
+
+from app.db.database import Base
+
+
+class EmailPendente(Base):
+    """
+    Caixa de saída de e-mails. As mensagens são gravadas na mesma transação dos dados que as
+    originaram e entregues depois por um worker, com novas tentativas e backoff exponencial.
+    Status: pendente, enviando, enviado ou falhou (esgotou as tentativas).
+    """
+    __tablename__ = "emails_pendentes"
+    __table_args__ = (
+        Index(
+            "ix_emails_pendentes_entrega", "proxima_tentativa_em",
+            postgresql_where=text("status IN ('pendente', 'enviando')"),
+        ),
+    )
+    id = Column(Integer, primary_key=True)
+    destinatario = Column(String, nullable=False)
+    assunto = Column(String, nullable=False)
+    corpo_html = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pendente")
+    tentativas = Column(Integer, nullable=False, default=0)
+    proxima_tentativa_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_erro = Column(Text, nullable=True)
+    criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    enviado_em = Column(DateTime, nullable=True)
+    # Chave das métricas da execução que gerou o e-mail (ex.: "execucao:12"), para contabilizar a entrega.
+    origem = Column(String, nullable=True)
@@ -1,7 +1,7 @@
 import uuid
 from operator import index
 
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Index
 from datetime import datetime
 from sqlalchemy.orm import relationship
 
@@ -13,13 +13,33 @@ from app.utils.assets.Images_url import usuario_avatar
 class Usuario(Base):
     __tablename__ = "usuarios"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)  # UUID
-    nome = Column(String, index=True, nullable=False)
+    # Índices apenas para os caminhos de acesso reais: chave primária, busca por e-mail e
+    # os índices parciais da automação abaixo (ver Scripts/verificar_planos_consultas.py).
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)  # UUID
+    nome = Column(String, nullable=False)
     email = Column(String, index=True, nullable=False, unique=True)
-    senha = Column(String, index=True, nullable=False)
-    avatar = Column(String, index=True, nullable=False, default=usuario_avatar)
-    data_criacao = Column(DateTime, index=True, default=datetime.utcnow)
-    role = Column(String, default="user", index=True)
-    notificacoes_ativadas = Column(Boolean, index=True, default=False)
+    senha = Column(String, nullable=False)
+    avatar = Column(String, nullable=False, default=usuario_avatar)
+    data_criacao = Column(DateTime, default=datetime.utcnow)
+    role = Column(String, default="user")
+    notificacoes_ativadas = Column(Boolean, default=False)
+    # NULL indica usuário ainda não verificado (ou que acabou de ativar as notificações): tem prioridade.
+    ultima_verificacao_em = Column(DateTime, nullable=True)
 
-    vazamentos = relationship("Vazamento", back_populates="usuario")
+    vazamentos = relationship("UsuarioVazamento", back_populates="usuario")
+
+
+# Atende a seleção contínua dos usuários com a verificação mais antiga.
+Index(
+    "ix_usuarios_verificacao_pendente",
+    Usuario.ultima_verificacao_em.asc().nulls_first(),
+    postgresql_where=Usuario.notificacoes_ativadas.is_(True),
+)
+
+
+# Atende a contagem e a varredura em lotes por ID (keyset) dos usuários com notificações ativadas.
+Index(
+    "ix_usuarios_com_notificacoes",
+    Usuario.id,
+    postgresql_where=Usuario.notificacoes_ativadas.is_(True),
+)
@@ -1,32 +1,51 @@
-import json
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Date, DateTime, Text
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Date, DateTime, Text, text
 from sqlalchemy.orm import relationship
 
 from app.db.database import Base
 
 
-class Vazamento(Base):
-    __tablename__ = "vazamentos"
-    id = Column(Integer, primary_key=True, index=True)
-    nome = Column(String, index=True)
-    titulo = Column(String, index=True)
-    dominio_url = Column(String, index=True)
+class CatalogoVazamento(Base):
+    """
+    Catálogo local dos vazamentos publicados pela API HIBP (endpoint /breaches).
+    As consultas por conta retornam apenas o nome do vazamento, que é resolvido aqui.
+    Os metadados de cada vazamento são gravados uma única vez; os usuários se ligam a eles
+    por `UsuarioVazamento`.
+    """
+    __tablename__ = "catalogo_vazamentos"
+    id = Column(Integer, primary_key=True)
+    nome = Column(String, unique=True, nullable=False)
+    titulo = Column(String, nullable=True)
+    dominio_url = Column(String, nullable=True)
     data_vazamento = Column(Date, nullable=True)
     data_adicao = Column(DateTime, nullable=True)
     data_atualizacao = Column(DateTime, nullable=True)
     pwn_count = Column(Integer, nullable=True)
     descricao = Column(Text, nullable=True)
     image_uri = Column(String, nullable=True)
-    data_classes = Column(Text, nullable=True)
-    usuario_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=False)
-    usuario = relationship("Usuario", back_populates="vazamentos")
+    # Lista de classes de dados expostas (ex.: ["Email addresses", "Passwords"]).
+    data_classes = Column(JSONB, nullable=False, default=list, server_default=text("'[]'::jsonb"))
+    sincronizado_em = Column(DateTime, nullable=True)
 
 
-    def get_data_classes(self):
-        return json.loads(self.data_classes) if self.data_classes else []
+class UsuarioVazamento(Base):
+    """
+    Associação entre um usuário e um vazamento do catálogo em que o e-mail dele aparece.
+    A chave primária começa por `usuario_id` e atende a busca dos vazamentos de um usuário.
+    """
+    __tablename__ = "usuarios_vazamentos"
+    usuario_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), primary_key=True)
+    catalogo_vazamento_id = Column(Integer, ForeignKey("catalogo_vazamentos.id"), primary_key=True)
+    primeira_deteccao_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    usuario = relationship("Usuario", back_populates="vazamentos")
+    vazamento = relationship("CatalogoVazamento")
 
-    def set_data_classes(self, data_classes_list):
-        self.data_classes = json.dumps(data_classes_list)
 
+# Atende o filtro por classe de dados (data_classes @> '["Passwords"]').
+Index("ix_catalogo_vazamentos_data_classes", CatalogoVazamento.data_classes, postgresql_using="gin")
+# Atende a listagem paginada dos vazamentos do usuário, do detectado mais recentemente para o mais antigo.
+Index("ix_usuarios_vazamentos_deteccao", UsuarioVazamento.usuario_id, UsuarioVazamento.primeira_deteccao_em,
+      UsuarioVazamento.catalogo_vazamento_id)
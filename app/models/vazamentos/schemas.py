@@ -38,11 +38,18 @@ class VazamentoResponse(BaseModel):
     image_uri: Optional[str] = None
     data_classes: List[str] = []  # Lista de strings
     usuario_id: uuid.UUID
+    primeira_deteccao_em: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class PaginaVazamentos(BaseModel):
+    itens: List[VazamentoResponse]
+    # Cursor opaco da próxima página; None na última.
+    proximo_cursor: Optional[str] = None
+
+
 class NotificacaoRequest(BaseModel):
     email_usuario: str
     titulo_vazamento: str
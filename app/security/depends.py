@@ -1,17 +1,18 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 from starlette import status
 
-from app.db.database import get_db_session
+from app.db.database import usar_primario
+from app.db.replicas import escolher_replica, sessao_de_leitura
 from app.models.usuarios.UsuarioModel import Usuario
 from app.security.security import verify_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/api/login")
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db_session)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     """
     Valida o token JWT e retorna o usuário atualizado a partir do banco de dados.
     """
@@ -23,13 +24,34 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if not email:
         raise HTTPException(status_code=401, detail="Token inválido ou incompleto")
 
-    usuario = db.query(Usuario).filter(Usuario.email == email).first()
+    async with sessao_de_leitura() as db:
+        usuario = await db.scalar(select(Usuario).where(Usuario.email == email))
+        if not usuario:
+            # Um cadastro recente pode ainda não ter chegado à réplica.
+            usar_primario(db)
+            usuario = await db.scalar(select(Usuario).where(Usuario.email == email))
+        elif db.sync_session.replica is not None and await escolher_replica(usuario.id) is None:
+            # O usuário escreveu há pouco: relê do primário para não devolver dados antigos da réplica.
+            usar_primario(db)
+            usuario = await db.scalar(
+                select(Usuario).where(Usuario.id == usuario.id).execution_options(populate_existing=True)
+            )
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
     return usuario
 
 
+async def get_async_db_session_leitura(current_user: Usuario = Depends(get_current_user)):
+    """
+    Sessão de leitura da requisição, que pode usar uma réplica. Logo após uma escrita do usuário
+    autenticado, lê do primário.
+    """
+    async with sessao_de_leitura(current_user.id) as session:
+        yield session
+
+
+
 
 
 
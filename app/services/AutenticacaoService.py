@@ -1,7 +1,9 @@
+import asyncio
 import logging
 
 from fastapi import HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from app.db.redis.redis_cache import redis
@@ -11,16 +13,17 @@ from app.security.security import verify_password, create_access_token, verify_a
 
 
 class AutenticacaoService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def autenticar_usuario(self, email: str, password: str) -> str:
+    async def autenticar_usuario(self, email: str, password: str) -> str:
         """Autentica um usuário e retorna o token JWT"""
         logging.info(f"Tentativa de autenticação para o e-mail: {email}")
 
-        usuario = self.db.query(Usuario).filter(email == Usuario.email).first()
+        usuario = await self.db.scalar(select(Usuario).where(email == Usuario.email))
 
-        if not usuario or not verify_password(password, usuario.senha):
+        # O bcrypt é intencionalmente lento; roda fora do event loop.
+        if not usuario or not await asyncio.to_thread(verify_password, password, usuario.senha):
             logging.warning(f"Falha na autenticação para o e-mail: {email} - Credenciais inválidas")
             raise HTTPException(status_code=401, detail="Credenciais inválidas")
 
@@ -0,0 +1,102 @@
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+
+import httpx
+from sqlalchemy import Select, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.redis.redis_cache import redis
+from app.models.vazamentos import models
+from app.utils.VazamentoUtils import (
+    buscar_catalogo_na_api,
+    processar_vazamento,
+    processar_vazamento_catalogo,
+    processar_vazamento_do_catalogo,
+)
+
+# Intervalo mínimo entre sincronizações disparadas por um nome ausente do catálogo.
+CATALOGO_INTERVALO_SINCRONIZACAO_FORCADA = int(os.getenv("CATALOGO_INTERVALO_SINCRONIZACAO_FORCADA", "600"))
+
+
+def consulta_catalogo_por_nomes(nomes: list[str]) -> Select:
+    # Também verificada com EXPLAIN por Scripts/verificar_planos_consultas.py.
+    return select(models.CatalogoVazamento).where(models.CatalogoVazamento.nome.in_(nomes))
+
+
+class CatalogoVazamentoService:
+    def __init__(self, db: AsyncSession, cliente_hibp: Optional[httpx.AsyncClient] = None):
+        self.db = db
+        self.cliente_hibp = cliente_hibp
+
+
+    async def sincronizar_catalogo(self) -> int:
+        """
+        Baixa o catálogo de vazamentos da API HIBP e faz upsert de todas as entradas pelo nome.
+        Retorna a quantidade de vazamentos sincronizados.
+        """
+        logging.info("Sincronizando catálogo de vazamentos com a API HIBP.")
+        vazamentos_api = await buscar_catalogo_na_api(self.cliente_hibp)
+        linhas = [processar_vazamento_catalogo(vazamento) for vazamento in vazamentos_api if vazamento.get("Name")]
+        if not linhas:
+            logging.warning("A API HIBP retornou um catálogo de vazamentos vazio.")
+            return 0
+
+        stmt = insert(models.CatalogoVazamento).values(linhas)
+        colunas_atualizadas = {
+            coluna: stmt.excluded[coluna] for coluna in linhas[0].keys() if coluna != "nome"
+        }
+        await self.db.execute(stmt.on_conflict_do_update(index_elements=["nome"], set_=colunas_atualizadas))
+        await self.db.commit()
+
+        logging.info(f"Catálogo de vazamentos sincronizado: {len(linhas)} vazamentos.")
+        return len(linhas)
+
+
+    async def obter_por_nomes(self, nomes: list[str]) -> dict[str, models.CatalogoVazamento]:
+        if not nomes:
+            return {}
+        entradas = (await self.db.scalars(consulta_catalogo_por_nomes(nomes))).all()
+        return {entrada.nome: entrada for entrada in entradas}
+
+
+    async def obter_ultima_publicacao_desde(self, desde: datetime) -> Optional[datetime]:
+        """
+        Data da publicação (adição ou alteração) mais recente no catálogo HIBP após `desde`, ou None.
+        """
+        publicacao = func.greatest(models.CatalogoVazamento.data_adicao, models.CatalogoVazamento.data_atualizacao)
+        return await self.db.scalar(select(func.max(publicacao)).where(publicacao > desde))
+
+
+    async def resolver_vazamentos(self, resultados_api: list[dict]) -> list[dict]:
+        """
+        Junta os nomes retornados pela consulta truncada da API com o catálogo local,
+        devolvendo os vazamentos no formato de `processar_vazamento`.
+        Nomes ausentes disparam uma sincronização do catálogo (no máximo uma por intervalo).
+        """
+        nomes = [resultado["Name"] for resultado in resultados_api if resultado.get("Name")]
+        catalogo = await self.obter_por_nomes(nomes)
+
+        ausentes = [nome for nome in nomes if nome not in catalogo]
+        if ausentes and await self._pode_forcar_sincronizacao():
+            logging.info(f"Vazamentos ausentes do catálogo local: {ausentes}. Forçando sincronização.")
+            await self.sincronizar_catalogo()
+            catalogo = await self.obter_por_nomes(nomes)
+
+        vazamentos = []
+        for resultado in resultados_api:
+            entrada = catalogo.get(resultado.get("Name"))
+            if entrada:
+                vazamentos.append(processar_vazamento_do_catalogo(entrada))
+            else:
+                logging.warning(f"Vazamento '{resultado.get('Name')}' não encontrado no catálogo local.")
+                vazamentos.append(processar_vazamento(resultado))
+        return vazamentos
+
+
+    async def _pode_forcar_sincronizacao(self) -> bool:
+        return bool(await redis.set(
+            "hibp:catalogo:sincronizacao_forcada", 1, nx=True, ex=CATALOGO_INTERVALO_SINCRONIZACAO_FORCADA
+        ))
@@ -0,0 +1,102 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.emails import models
+
+EMAIL_MAX_TENTATIVAS = int(os.getenv("EMAIL_MAX_TENTATIVAS", "6"))
+EMAIL_BACKOFF_BASE_SEGUNDOS = int(os.getenv("EMAIL_BACKOFF_BASE_SEGUNDOS", "60"))
+EMAIL_BACKOFF_MAXIMO_SEGUNDOS = int(os.getenv("EMAIL_BACKOFF_MAXIMO_SEGUNDOS", "3600"))
+# Tempo após o qual um e-mail em "enviando" (worker interrompido) volta a ser entregue.
+EMAIL_LEASE_ENVIO_SEGUNDOS = int(os.getenv("EMAIL_LEASE_ENVIO_SEGUNDOS", "300"))
+
+
+class EmailPendenteService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+
+    def enfileirar_email(self, destinatario: str, assunto: str, corpo_html: str,
+                         origem: Optional[str] = None) -> models.EmailPendente:
+        """
+        Adiciona um e-mail à caixa de saída sem fazer commit, para que seja gravado na
+        mesma transação dos dados que o originaram.
+        """
+        email = models.EmailPendente(destinatario=destinatario, assunto=assunto, corpo_html=corpo_html, origem=origem)
+        self.db.add(email)
+        return email
+
+
+    async def reivindicar_lote(self, limite: int) -> tuple[list[tuple], list[Optional[str]]]:
+        """
+        Reivindica até `limite` e-mails prontos para envio, marcando-os como "enviando".
+        Usa SKIP LOCKED para que vários workers dividam a fila sem enviar a mesma mensagem.
+        E-mails que já esgotaram as tentativas (ex.: o worker caiu durante cada envio) vão para
+        "falhou" em vez de serem reivindicados de novo.
+        Retorna as tuplas (id, tentativas, destinatario, assunto, corpo_html, origem) do lote
+        e as origens dos e-mails descartados.
+        """
+        agora = datetime.utcnow()
+        emails = (await self.db.scalars(
+            select(models.EmailPendente)
+            .where(
+                models.EmailPendente.status.in_(["pendente", "enviando"]),
+                models.EmailPendente.proxima_tentativa_em <= agora,
+            )
+            .order_by(models.EmailPendente.proxima_tentativa_em)
+            .limit(limite)
+            .with_for_update(skip_locked=True)
+        )).all()
+        lote = []
+        origens_descartadas = []
+        for email in emails:
+            if email.tentativas >= EMAIL_MAX_TENTATIVAS:
+                email.status = "falhou"
+                email.ultimo_erro = email.ultimo_erro or "Envio interrompido em todas as tentativas."
+                logging.error(f"E-mail {email.id} descartado após {email.tentativas} tentativas: {email.ultimo_erro}")
+                origens_descartadas.append(email.origem)
+                continue
+            email.status = "enviando"
+            email.tentativas += 1
+            email.proxima_tentativa_em = agora + timedelta(seconds=EMAIL_LEASE_ENVIO_SEGUNDOS)
+            lote.append((email.id, email.tentativas, email.destinatario, email.assunto, email.corpo_html, email.origem))
+        await self.db.commit()
+        return lote, origens_descartadas
+
+
+    async def marcar_enviados(self, ids: list[int]):
+        if not ids:
+            return
+        await self.db.execute(
+            update(models.EmailPendente)
+            .where(models.EmailPendente.id.in_(ids))
+            .values(status="enviado", enviado_em=datetime.utcnow(), ultimo_erro=None)
+        )
+        await self.db.commit()
+
+
+    async def registrar_falha(self, email_id: int, tentativas: int, erro: str) -> bool:
+        """
+        Agenda uma nova tentativa com backoff exponencial ou, após EMAIL_MAX_TENTATIVAS,
+        move o e-mail para "falhou" (dead letter). Retorna True quando o e-mail foi descartado.
+        """
+        descartado = tentativas >= EMAIL_MAX_TENTATIVAS
+        if descartado:
+            valores = {"status": "falhou", "ultimo_erro": erro}
+            logging.error(f"E-mail {email_id} descartado após {tentativas} tentativas: {erro}")
+        else:
+            espera = min(EMAIL_BACKOFF_MAXIMO_SEGUNDOS, EMAIL_BACKOFF_BASE_SEGUNDOS * 2 ** (tentativas - 1))
+            valores = {
+                "status": "pendente",
+                "ultimo_erro": erro,
+                "proxima_tentativa_em": datetime.utcnow() + timedelta(seconds=espera),
+            }
+            logging.warning(f"Falha ao enviar o e-mail {email_id} (tentativa {tentativas}). Nova tentativa em {espera}s.")
+
+        await self.db.execute(update(models.EmailPendente).where(models.EmailPendente.id == email_id).values(**valores))
+        await self.db.commit()
+        return descartado
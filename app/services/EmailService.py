@@ -1,3 +1,7 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Optional
+
 import aiosmtplib
 import logging
 from email.message import EmailMessage
@@ -9,13 +13,107 @@ from fastapi import HTTPException
 load_dotenv()
 
 
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+# Host e porta configuráveis para permitir um servidor SMTP local em testes e benchmarks.
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
 
 SMTP_USERNAME = os.getenv("SMTP_USERNAME")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 
-async def enviar_email(destinatario: str, assunto: str, mensagem_html: str):
+# Conexões autenticadas mantidas abertas; também é o limite de envios simultâneos.
+SMTP_POOL_TAMANHO = int(os.getenv("SMTP_POOL_TAMANHO", "3"))
+# Após esse número de mensagens a conexão é renovada (servidores como o Gmail limitam por sessão).
+SMTP_MENSAGENS_POR_CONEXAO = int(os.getenv("SMTP_MENSAGENS_POR_CONEXAO", "100"))
+
+_ERROS_DE_CONEXAO = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+)
+
+
+@dataclass
+class _ConexaoSMTP:
+    smtp: aiosmtplib.SMTP
+    mensagens_enviadas: int = 0
+
+
+class PoolSMTP:
+    """
+    Pool de conexões SMTP autenticadas e reutilizadas entre mensagens. Cada envio pega uma
+    conexão do pool (aguardando se todas estiverem em uso) e reconecta em caso de falha.
+    """
+
+    def __init__(self, tamanho: int):
+        self._conexoes: asyncio.Queue[Optional[_ConexaoSMTP]] = asyncio.Queue()
+        for _ in range(tamanho):
+            self._conexoes.put_nowait(None)
+
+    async def enviar(self, email: EmailMessage):
+        conexao = await self._conexoes.get()
+        try:
+            for tentativa in (1, 2):
+                try:
+                    if not self._conexao_reutilizavel(conexao):
+                        await self._fechar(conexao)
+                        conexao = await self._conectar()
+                    await conexao.smtp.send_message(email)
+                    conexao.mensagens_enviadas += 1
+                    return
+                except _ERROS_DE_CONEXAO as e:
+                    await self._fechar(conexao)
+                    conexao = None
+                    if tentativa == 2:
+                        raise
+                    logging.warning(f"Conexão SMTP perdida ({e}). Reconectando.")
+        finally:
+            self._conexoes.put_nowait(conexao)
+
+    async def encerrar(self):
+        while not self._conexoes.empty():
+            await self._fechar(self._conexoes.get_nowait())
+
+    @staticmethod
+    def _conexao_reutilizavel(conexao: Optional[_ConexaoSMTP]) -> bool:
+        return (
+            conexao is not None
+            and conexao.smtp.is_connected
+            and conexao.mensagens_enviadas < SMTP_MENSAGENS_POR_CONEXAO
+        )
+
+    @staticmethod
+    async def _conectar() -> _ConexaoSMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=SMTP_SERVER, port=SMTP_PORT, start_tls=SMTP_STARTTLS, timeout=SMTP_TIMEOUT
+        )
+        await smtp.connect()
+        if SMTP_USERNAME:
+            try:
+                await smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+            except Exception:
+                # Sem isso a conexão já aberta ficaria perdida, fora do pool.
+                smtp.close()
+                raise
+        logging.info(f"Nova conexão SMTP aberta com {SMTP_SERVER}:{SMTP_PORT}.")
+        return _ConexaoSMTP(smtp)
+
+    @staticmethod
+    async def _fechar(conexao: Optional[_ConexaoSMTP]):
+        if conexao is None or not conexao.smtp.is_connected:
+            return
+        try:
+            await conexao.smtp.quit()
+        except Exception:
+            conexao.smtp.close()
+
+
+pool_smtp = PoolSMTP(SMTP_POOL_TAMANHO)
+
+
+def montar_email(destinatario: str, assunto: str, mensagem_html: str) -> EmailMessage:
     email = EmailMessage()
     email["From"] = f"Start Osint Sec - SOS <{SMTP_USERNAME}>"
     email["To"] = destinatario
@@ -23,16 +121,19 @@ async def enviar_email(destinatario: str, assunto: str, mensagem_html: str):
 
     # Define o conteúdo do e-mail como HTML
     email.set_content(mensagem_html, subtype="html")
+    return email
+
+
+async def enviar_email(destinatario: str, assunto: str, mensagem_html: str):
+    email = montar_email(destinatario, assunto, mensagem_html)
 
     try:
-        await aiosmtplib.send(
-            email,
-            hostname=SMTP_SERVER,
-            port=SMTP_PORT,
-            username=SMTP_USERNAME,
-            password=SMTP_PASSWORD,
-            start_tls=True
-        )
+        await pool_smtp.enviar(email)
     except Exception as e:
         logging.error(f"Erro ao enviar e-mail: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao enviar e-mail: {str(e)}")
+
+
+async def encerrar_pool_smtp():
+    await pool_smtp.encerrar()
+    logging.info("Conexões SMTP encerradas.")
@@ -0,0 +1,239 @@
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models.automacoes import models
+
+AUTOMACAO_TOTAL_SHARDS = int(os.getenv("AUTOMACAO_TOTAL_SHARDS", "16"))
+AUTOMACAO_LEASE_SEGUNDOS = int(os.getenv("AUTOMACAO_LEASE_SEGUNDOS", "300"))
+
+_ESPACO_UUID = 2 ** 128
+
+
+def limites_do_shard(numero: int, total_shards: int) -> tuple[uuid.UUID, Optional[uuid.UUID]]:
+    """
+    Retorna a faixa [inicio, fim) de IDs de usuário do shard. O último shard não tem limite superior.
+    """
+    inicio = uuid.UUID(int=numero * _ESPACO_UUID // total_shards)
+    fim = uuid.UUID(int=(numero + 1) * _ESPACO_UUID // total_shards) if numero + 1 < total_shards else None
+    return inicio, fim
+
+
+class ExecucaoAutomacaoService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+
+    async def obter_execucao_em_andamento(self) -> Optional[models.ExecucaoAutomacao]:
+        return await self.db.scalar(
+            select(models.ExecucaoAutomacao)
+            .where(models.ExecucaoAutomacao.status == "em_andamento")
+            .order_by(models.ExecucaoAutomacao.id.desc())
+            .limit(1)
+        )
+
+
+    async def obter_inicio_da_ultima_execucao_bem_sucedida(self) -> Optional[datetime]:
+        """
+        Retorna o início da última execução concluída ou ignorada por falta de novidades.
+        """
+        return await self.db.scalar(
+            select(models.ExecucaoAutomacao.iniciada_em)
+            .where(models.ExecucaoAutomacao.status.in_(["concluida", "ignorada"]))
+            .order_by(models.ExecucaoAutomacao.iniciada_em.desc())
+            .limit(1)
+        )
+
+
+    async def registrar_execucao_ignorada(self, novidades_desde: datetime,
+                                    metricas: Optional[dict] = None) -> models.ExecucaoAutomacao:
+        agora = datetime.utcnow()
+        execucao = models.ExecucaoAutomacao(
+            status="ignorada", iniciada_em=agora, finalizada_em=agora, total_shards=0,
+            novidades_desde=novidades_desde, metricas=metricas,
+        )
+        self.db.add(execucao)
+        await self.db.commit()
+        await self.db.refresh(execucao)
+        return execucao
+
+
+    async def obter_ou_criar_execucao(self, novidades_desde: Optional[datetime] = None) -> models.ExecucaoAutomacao:
+        """
+        Retoma a execução interrompida, se existir, ou cria uma nova com todos os shards pendentes.
+        """
+        execucao = await self.obter_execucao_em_andamento()
+        if execucao:
+            logging.info(f"Retomando a execução de automação {execucao.id} iniciada em {execucao.iniciada_em}.")
+            return execucao
+
+        execucao = models.ExecucaoAutomacao(total_shards=AUTOMACAO_TOTAL_SHARDS, novidades_desde=novidades_desde)
+        try:
+            self.db.add(execucao)
+            await self.db.flush()
+            self.db.add_all([
+                models.ShardExecucao(execucao_id=execucao.id, numero=numero)
+                for numero in range(AUTOMACAO_TOTAL_SHARDS)
+            ])
+            await self.db.commit()
+        except IntegrityError:
+            # Outro processo criou a execução ao mesmo tempo; participa dela.
+            await self.db.rollback()
+            return await self.obter_execucao_em_andamento()
+        await self.db.refresh(execucao)
+        logging.info(f"Execução de automação {execucao.id} criada com {AUTOMACAO_TOTAL_SHARDS} shards.")
+        return execucao
+
+
+    async def reivindicar_shard(self, execucao_id: int, dono: str) -> Optional[models.ShardExecucao]:
+        """
+        Reivindica um shard não concluído e sem lease válido. Usa SKIP LOCKED para que
+        vários workers possam reivindicar shards ao mesmo tempo sem disputa.
+        """
+        agora = datetime.utcnow()
+        shard = await self.db.scalar(
+            select(models.ShardExecucao)
+            .where(
+                models.ShardExecucao.execucao_id == execucao_id,
+                models.ShardExecucao.status != "concluido",
+                or_(models.ShardExecucao.lease_expira_em.is_(None), models.ShardExecucao.lease_expira_em < agora),
+            )
+            .order_by(models.ShardExecucao.numero)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        if not shard:
+            await self.db.rollback()
+            return None
+
+        shard.status = "em_andamento"
+        shard.dono_lease = dono
+        shard.lease_expira_em = agora + timedelta(seconds=AUTOMACAO_LEASE_SEGUNDOS)
+        await self.db.commit()
+        await self.db.refresh(shard)
+        logging.info(f"Shard {shard.numero} da execução {execucao_id} reivindicado por {dono}.")
+        return shard
+
+
+    async def renovar_lease(self, shard_id: int, dono: str) -> bool:
+        """
+        Renova o lease do shard. Retorna False se o lease foi perdido para outro worker.
+        """
+        resultado = await self.db.execute(
+            update(models.ShardExecucao)
+            .where(models.ShardExecucao.id == shard_id, models.ShardExecucao.dono_lease == dono)
+            .values(lease_expira_em=datetime.utcnow() + timedelta(seconds=AUTOMACAO_LEASE_SEGUNDOS))
+        )
+        await self.db.commit()
+        return resultado.rowcount == 1
+
+
+    async def registrar_checkpoint(self, shard_id: int, dono: str, ultimo_usuario_id: uuid.UUID,
+                             processados: int, falhas: int) -> bool:
+        """
+        Grava o último usuário concluído do shard e renova o lease.
+        Retorna False se o lease foi perdido para outro worker.
+        """
+        resultado = await self.db.execute(
+            update(models.ShardExecucao)
+            .where(models.ShardExecucao.id == shard_id, models.ShardExecucao.dono_lease == dono)
+            .values(
+                ultimo_usuario_id=ultimo_usuario_id,
+                usuarios_processados=models.ShardExecucao.usuarios_processados + processados,
+                falhas=models.ShardExecucao.falhas + falhas,
+                lease_expira_em=datetime.utcnow() + timedelta(seconds=AUTOMACAO_LEASE_SEGUNDOS),
+                atualizado_em=datetime.utcnow(),
+            )
+        )
+        await self.db.commit()
+        return resultado.rowcount == 1
+
+
+    async def concluir_shard(self, shard_id: int, dono: str) -> bool:
+        resultado = await self.db.execute(
+            update(models.ShardExecucao)
+            .where(models.ShardExecucao.id == shard_id, models.ShardExecucao.dono_lease == dono)
+            .values(status="concluido", dono_lease=None, lease_expira_em=None, atualizado_em=datetime.utcnow())
+        )
+        await self.db.commit()
+        return resultado.rowcount == 1
+
+
+    async def finalizar_execucao_se_concluida(self, execucao_id: int) -> bool:
+        """
+        Marca a execução como concluída quando todos os seus shards terminaram.
+        """
+        shards_pendentes = await self.db.scalar(
+            select(models.ShardExecucao.id)
+            .where(models.ShardExecucao.execucao_id == execucao_id, models.ShardExecucao.status != "concluido")
+            .limit(1)
+        )
+        if shards_pendentes:
+            return False
+
+        resultado = await self.db.execute(
+            update(models.ExecucaoAutomacao)
+            .where(models.ExecucaoAutomacao.id == execucao_id, models.ExecucaoAutomacao.status == "em_andamento")
+            .values(status="concluida", finalizada_em=datetime.utcnow())
+        )
+        await self.db.commit()
+        if resultado.rowcount == 1:
+            logging.info(f"Execução de automação {execucao_id} concluída.")
+        return True
+
+
+    async def salvar_metricas(self, execucao_id: int, metricas: Optional[dict]):
+        await self.db.execute(
+            update(models.ExecucaoAutomacao)
+            .where(models.ExecucaoAutomacao.id == execucao_id)
+            .values(metricas=metricas)
+        )
+        await self.db.commit()
+
+
+    async def listar_execucoes(self, limite: int) -> list[models.ExecucaoAutomacao]:
+        execucoes = await self.db.scalars(
+            select(models.ExecucaoAutomacao)
+            .order_by(models.ExecucaoAutomacao.id.desc())
+            .limit(limite)
+        )
+        return execucoes.all()
+
+
+    async def obter_execucao(self, execucao_id: int) -> models.ExecucaoAutomacao:
+        execucao = await self.db.get(
+            models.ExecucaoAutomacao, execucao_id, options=[selectinload(models.ExecucaoAutomacao.shards)]
+        )
+        if not execucao:
+            raise HTTPException(status_code=404, detail="Execução não encontrada")
+        return execucao
+
+
+    async def resumir_shards(self, execucao_ids: list[int]) -> dict[int, dict]:
+        """
+        Progresso agregado dos shards de cada execução: shards concluídos, usuários processados e falhas.
+        """
+        if not execucao_ids:
+            return {}
+        linhas = await self.db.execute(
+            select(
+                models.ShardExecucao.execucao_id,
+                func.count().filter(models.ShardExecucao.status == "concluido"),
+                func.coalesce(func.sum(models.ShardExecucao.usuarios_processados), 0),
+                func.coalesce(func.sum(models.ShardExecucao.falhas), 0),
+            )
+            .where(models.ShardExecucao.execucao_id.in_(execucao_ids))
+            .group_by(models.ShardExecucao.execucao_id)
+        )
+        return {
+            execucao_id: {"shards_concluidos": concluidos, "usuarios_processados": processados, "falhas": falhas}
+            for execucao_id, concluidos, processados, falhas in linhas
+        }
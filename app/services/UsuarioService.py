@@ -1,20 +1,76 @@
+import asyncio
 import uuid
+from datetime import datetime
+from typing import AsyncIterator, Optional
 
 import bcrypt
 from fastapi import HTTPException
 from app.models.usuarios import UsuarioSchemas, UsuarioModel
-from sqlalchemy.orm import Session
+from sqlalchemy import Row, Select, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
+from app.db.replicas import registrar_escrita
 from app.security.security import hash_password
 
+# Construtores das consultas dos serviços, compartilhados com Scripts/verificar_planos_consultas.py,
+# que confere com EXPLAIN se os planos das consultas reais continuam usando os índices.
+
+def consulta_usuario_por_id(usuario_id: uuid.UUID) -> Select:
+    return select(UsuarioModel.Usuario).where(usuario_id == UsuarioModel.Usuario.id)
+
+
+def consulta_usuario_por_email(email: str) -> Select:
+    return select(UsuarioModel.Usuario).where(email == UsuarioModel.Usuario.email)
+
+
+def consulta_lote_de_usuarios_com_notificacoes(inicio: Optional[uuid.UUID] = None, fim: Optional[uuid.UUID] = None,
+                                               apos_id: Optional[uuid.UUID] = None, tamanho_lote: int = 1000,
+                                               verificados_antes: Optional[datetime] = None) -> Select:
+    Usuario = UsuarioModel.Usuario
+    filtros = [True == Usuario.notificacoes_ativadas]
+    if apos_id is not None:
+        filtros.append(Usuario.id > apos_id)
+    elif inicio is not None:
+        filtros.append(Usuario.id >= inicio)
+    if fim is not None:
+        filtros.append(Usuario.id < fim)
+    if verificados_antes is not None:
+        filtros.append(or_(Usuario.ultima_verificacao_em.is_(None),
+                           Usuario.ultima_verificacao_em < verificados_antes))
+    return (
+        select(Usuario.id, Usuario.nome, Usuario.email)
+        .where(*filtros)
+        .order_by(Usuario.id)
+        .limit(tamanho_lote)
+    )
+
+
+def consulta_contagem_usuarios_com_notificacoes() -> Select:
+    return select(func.count(UsuarioModel.Usuario.id)).where(True == UsuarioModel.Usuario.notificacoes_ativadas)
+
+
+def consulta_usuarios_para_verificacao(limite: int, verificados_antes: datetime) -> Select:
+    Usuario = UsuarioModel.Usuario
+    return (
+        select(Usuario.id, Usuario.nome, Usuario.email)
+        .where(
+            True == Usuario.notificacoes_ativadas,
+            or_(Usuario.ultima_verificacao_em.is_(None), Usuario.ultima_verificacao_em < verificados_antes),
+        )
+        .order_by(Usuario.ultima_verificacao_em.asc().nulls_first())
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    )
+
+
 class UsuarioService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db= db
 
-    def obter_usuario_pelo_id(self, usuarioId: uuid.UUID):
+    async def obter_usuario_pelo_id(self, usuarioId: uuid.UUID):
         logging.info(f"Tentando obter usuário pelo ID: {usuarioId}")
-        usuario = self.db.query(UsuarioModel.Usuario).filter(usuarioId == UsuarioModel.Usuario.id).first()
+        usuario = await self.db.scalar(consulta_usuario_por_id(usuarioId))
         if not usuario:
             logging.warning(f"Usuário com ID {usuarioId} não encontrado.")
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
@@ -22,9 +78,9 @@ class UsuarioService:
         return usuario
 
 
-    def obter_usuario_pelo_email(self, user_email: str):
+    async def obter_usuario_pelo_email(self, user_email: str):
         logging.info(f"Tentando obter usuário pelo e-mail: {user_email}")
-        usuario = self.db.query(UsuarioModel.Usuario).filter(user_email == UsuarioModel.Usuario.email).first()
+        usuario = await self.db.scalar(consulta_usuario_por_email(user_email))
         if not usuario:
             logging.warning(f"Usuário com e-mail {user_email} não encontrado.")
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
@@ -32,14 +88,15 @@ class UsuarioService:
         return usuario
 
 
-    def criar_usuario(self, usuario: UsuarioSchemas.CreateUserRequest):
+    async def criar_usuario(self, usuario: UsuarioSchemas.CreateUserRequest):
         logging.info(f"Tentando criar usuário com e-mail: {usuario.email}")
-        usuario_existente = self.db.query(UsuarioModel.Usuario).filter(usuario.email == UsuarioModel.Usuario.email).first()
+        usuario_existente = await self.db.scalar(consulta_usuario_por_email(usuario.email))
         if usuario_existente:
             logging.warning(f"Já existe um usuário com o e-mail {usuario.email}.")
             raise HTTPException(status_code=422, detail="Voce nao pode criar uma conta com esse email. Tente outro")
 
-        senha_criptografada = hash_password(usuario.senha)
+        # O bcrypt é intencionalmente lento; roda fora do event loop.
+        senha_criptografada = await asyncio.to_thread(hash_password, usuario.senha)
 
         db_usuario = UsuarioModel.Usuario(
             nome=usuario.nome,
@@ -47,20 +104,20 @@ class UsuarioService:
             senha=senha_criptografada
         )
         self.db.add(db_usuario)
-        self.db.commit()
-        self.db.refresh(db_usuario)
+        await self.db.commit()
+        await self.db.refresh(db_usuario)
+        await registrar_escrita(db_usuario.id)
         logging.info(f"Usuário com e-mail {usuario.email} criado com sucesso.")
         return db_usuario
 
 
-    def atualizar_usuario(self, usuario_id: uuid.UUID, usuario: UsuarioSchemas.UpdateUserRequest):
+    async def atualizar_usuario(self, usuario_id: uuid.UUID, usuario: UsuarioSchemas.UpdateUserRequest):
         logging.info(f"Tentando atualizar usuário com ID: {usuario_id}")
-        usuariodb = self.obter_usuario_pelo_id(usuario_id)
+        usuariodb = await self.obter_usuario_pelo_id(usuario_id)
 
         if usuario.email != usuariodb.email:
             logging.info(f"Alterando e-mail do usuário {usuariodb.email} para {usuario.email}")
-            email_usuario_existente = self.db.query(UsuarioModel.Usuario).filter(
-                usuario.email == UsuarioModel.Usuario.email).first()
+            email_usuario_existente = await self.db.scalar(consulta_usuario_por_email(usuario.email))
             if email_usuario_existente:
                 logging.warning(f"Já existe um usuário com o e-mail {usuario.email}.")
                 raise HTTPException(status_code=422, detail="Voce nao pode atualizar, email em uso. Tente outro")
@@ -71,21 +128,81 @@ class UsuarioService:
         if usuario.email:
             usuariodb.email = usuario.email
         if usuario.senha:
-            senha_criptografada = hash_password(usuario.senha)
+            senha_criptografada = await asyncio.to_thread(hash_password, usuario.senha)
             usuariodb.senha = senha_criptografada
         if usuario.notificacoes_ativadas is not None:
+            if usuario.notificacoes_ativadas and not usuariodb.notificacoes_ativadas:
+                # Quem acabou de ativar as notificações entra no início da fila da verificação contínua.
+                usuariodb.ultima_verificacao_em = None
             usuariodb.notificacoes_ativadas = usuario.notificacoes_ativadas
 
 
-        self.db.commit()
-        self.db.refresh(usuariodb)
+        await self.db.commit()
+        await self.db.refresh(usuariodb)
+        await registrar_escrita(usuariodb.id)
         logging.info(f"Usuário com ID {usuario_id} atualizado com sucesso.")
         return usuariodb
 
 
-    def obter_lista_de_usuarios_com_notifacao_ativadas(self):
-        logging.info("Obtendo lista de usuários com notificações ativadas.")
-        lista_de_usuarios_ativados = self.db.query(UsuarioModel.Usuario).filter(
-            True == UsuarioModel.Usuario.notificacoes_ativadas).all()
-        logging.info(f"{len(lista_de_usuarios_ativados)} usuários com notificações ativadas encontrados.")
-        return lista_de_usuarios_ativados
+    async def iterar_lotes_de_usuarios_com_notificacoes_ativadas(self, inicio: Optional[uuid.UUID] = None,
+                                                                fim: Optional[uuid.UUID] = None,
+                                                                apos_id: Optional[uuid.UUID] = None,
+                                                                tamanho_lote: int = 1000,
+                                                                verificados_antes: Optional[datetime] = None
+                                                                ) -> AsyncIterator[list[Row]]:
+        """
+        Percorre os usuários com notificações ativadas na faixa [inicio, fim) em lotes ordenados por ID
+        (paginação por keyset a partir de `apos_id`). Carrega apenas id, nome e e-mail, sem objetos ORM
+        no identity map da sessão, mantendo a memória constante independentemente do número de usuários.
+        Com `verificados_antes`, ignora os usuários verificados a partir dessa data.
+        """
+        while True:
+            resultado = await self.db.execute(
+                consulta_lote_de_usuarios_com_notificacoes(inicio, fim, apos_id, tamanho_lote, verificados_antes)
+            )
+            lote = resultado.all()
+            # Encerra a transação de leitura para devolver a conexão ao pool enquanto o lote é processado.
+            await self.db.rollback()
+
+            if not lote:
+                return
+            yield lote
+            if len(lote) < tamanho_lote:
+                return
+            apos_id = lote[-1].id
+
+
+    async def contar_usuarios_com_notificacoes_ativadas(self) -> int:
+        return await self.db.scalar(consulta_contagem_usuarios_com_notificacoes())
+
+
+    async def reivindicar_usuarios_para_verificacao(self, limite: int, verificados_antes: datetime) -> list[Row]:
+        """
+        Reivindica até `limite` usuários nunca verificados ou verificados antes de `verificados_antes`,
+        começando pelos que nunca foram verificados e depois pela verificação mais antiga.
+        A data de verificação é marcada já na reivindicação, com SKIP LOCKED, para que outro
+        processo não escolha os mesmos usuários. Retorna linhas (id, nome, email).
+        """
+        Usuario = UsuarioModel.Usuario
+        resultado = await self.db.execute(consulta_usuarios_para_verificacao(limite, verificados_antes))
+        usuarios = resultado.all()
+        if usuarios:
+            await self.db.execute(
+                update(Usuario)
+                .where(Usuario.id.in_([usuario.id for usuario in usuarios]))
+                .values(ultima_verificacao_em=datetime.utcnow())
+            )
+        await self.db.commit()
+        return usuarios
+
+
+    async def marcar_usuario_verificado(self, usuario_id: uuid.UUID, verificado_em: Optional[datetime] = None):
+        """
+        Registra a verificação do usuário sem fazer commit, para que seja gravada na mesma
+        transação dos vazamentos encontrados. Uma data anterior a agora antecipa a próxima verificação.
+        """
+        await self.db.execute(
+            update(UsuarioModel.Usuario)
+            .where(UsuarioModel.Usuario.id == usuario_id)
+            .values(ultima_verificacao_em=verificado_em or datetime.utcnow())
+        )
@@ -1,33 +1,98 @@
 import uuid
-from typing import Optional
+from typing import AsyncIterator, Optional
 import httpx
-import os
 from fastapi import HTTPException
 from datetime import datetime
-from dotenv import load_dotenv
-from sqlalchemy import desc
+from sqlalchemy import Row, Select, desc, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
 
+from app.db.database import usar_primario
+from app.db.redis.single_flight import executar_uma_vez
+from app.db.replicas import registrar_escrita
 from app.models.vazamentos import models, schemas
-from sqlalchemy.orm import Session
-
-from app.services.EmailService import enviar_email
-import json
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.services.CatalogoVazamentoService import CatalogoVazamentoService
 from app.services.UsuarioService import UsuarioService
-from app.utils.VazamentoUtils import buscar_vazamentos_na_api, processar_vazamento
+from app.utils.Paginacao import PAGINACAO_LIMITE_PADRAO, codificar_cursor, decodificar_cursor
+from app.utils.VazamentoUtils import buscar_vazamentos_na_api
+
+
+# Construtores das consultas do serviço, também verificados com EXPLAIN por Scripts/verificar_planos_consultas.py.
+
+def _consulta_vazamentos_com_deteccao() -> Select:
+    return (
+        select(models.CatalogoVazamento, models.UsuarioVazamento.primeira_deteccao_em)
+        .join(models.UsuarioVazamento, models.UsuarioVazamento.catalogo_vazamento_id == models.CatalogoVazamento.id)
+    )
+
+
+def consulta_vazamento_do_usuario(usuario_id: uuid.UUID, catalogo_vazamento_id: int) -> Select:
+    return _consulta_vazamentos_com_deteccao().where(
+        usuario_id == models.UsuarioVazamento.usuario_id,
+        catalogo_vazamento_id == models.UsuarioVazamento.catalogo_vazamento_id,
+    )
+
+
+def consulta_algum_vazamento_do_usuario(usuario_id: uuid.UUID) -> Select:
+    return (
+        select(models.UsuarioVazamento.catalogo_vazamento_id)
+        .where(usuario_id == models.UsuarioVazamento.usuario_id)
+        .limit(1)
+    )
+
+
+def consulta_vazamentos_do_usuario(usuario_id: uuid.UUID, classes_de_dados: Optional[list[str]] = None) -> Select:
+    stmt = _consulta_vazamentos_com_deteccao().where(usuario_id == models.UsuarioVazamento.usuario_id)
+    if classes_de_dados:
+        stmt = stmt.where(models.CatalogoVazamento.data_classes.contains(classes_de_dados))
+    return stmt.order_by(desc(models.CatalogoVazamento.data_vazamento))
+
+
+def consulta_pagina_vazamentos_do_usuario(usuario_id: uuid.UUID, limite: int,
+                                          apos: Optional[tuple[datetime, int]] = None) -> Select:
+    # A ordem (primeira_deteccao_em, catalogo_vazamento_id) é a do índice ix_usuarios_vazamentos_deteccao.
+    chave = tuple_(models.UsuarioVazamento.primeira_deteccao_em, models.UsuarioVazamento.catalogo_vazamento_id)
+    stmt = _consulta_vazamentos_com_deteccao().where(usuario_id == models.UsuarioVazamento.usuario_id)
+    if apos:
+        stmt = stmt.where(chave < apos)
+    return (
+        stmt.order_by(models.UsuarioVazamento.primeira_deteccao_em.desc(),
+                      models.UsuarioVazamento.catalogo_vazamento_id.desc())
+        .limit(limite + 1)
+    )
+
+
+def consulta_pagina_vazamentos(limite: int, apos: Optional[tuple[uuid.UUID, int]] = None) -> Select:
+    stmt = (
+        select(models.CatalogoVazamento, models.UsuarioVazamento.primeira_deteccao_em,
+               models.UsuarioVazamento.usuario_id)
+        .join(models.UsuarioVazamento, models.UsuarioVazamento.catalogo_vazamento_id == models.CatalogoVazamento.id)
+    )
+    if apos:
+        stmt = stmt.where(
+            tuple_(models.UsuarioVazamento.usuario_id, models.UsuarioVazamento.catalogo_vazamento_id) > apos
+        )
+    return (
+        stmt.order_by(models.UsuarioVazamento.usuario_id, models.UsuarioVazamento.catalogo_vazamento_id)
+        .limit(limite + 1)
+    )
 
 
 class VazamentoService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, cliente_hibp: Optional[httpx.AsyncClient] = None):
         self.db = db
+        self.cliente_hibp = cliente_hibp
+        self.catalogo_service = CatalogoVazamentoService(db, cliente_hibp)
 
 
 
-    def obter_vazamento_por_id(self, vazamentoId: int):
-        vazamento = self.db.query(models.Vazamento).filter(vazamentoId == models.Vazamento.id).first()
-        if not vazamento:
+    async def obter_vazamento_do_usuario(self, usuario_id: uuid.UUID,
+                                         catalogo_vazamento_id: int) -> schemas.VazamentoResponse:
+        linha = (await self.db.execute(consulta_vazamento_do_usuario(usuario_id, catalogo_vazamento_id))).first()
+        if not linha:
             raise HTTPException(status_code=404, detail="Vazamento não encontrado")
-        return vazamento
+        return self._montar_resposta(*linha, usuario_id)
 
 
     async def obter_vazamentos_pelo_email_usuario_e_salva_no_db(self, email: str) -> list[schemas.VazamentoResponse]:
@@ -36,116 +101,221 @@ class VazamentoService:
         Busca localmente no banco ou externamente na API Have I Been Pwned.
         """
         usuario_service = UsuarioService(self.db)
-        usuario = usuario_service.obter_usuario_pelo_email(email)
-        vazamentos_locais = self.buscar_vazamentos_no_banco(usuario.id)
+        usuario = await usuario_service.obter_usuario_pelo_email(email)
+        vazamentos_locais = await self.buscar_vazamentos_no_banco(usuario.id)
         if vazamentos_locais:
             return vazamentos_locais
 
-        resultados_api = await buscar_vazamentos_na_api(email)
-
-        if resultados_api:
-            for vazamento_data in resultados_api:
-                self.criar_vazamento_no_banco_de_dados(processar_vazamento(vazamento_data), usuario.id)
+        await executar_uma_vez(
+            f"vazamentos:usuario:{usuario.id}",
+            lambda: self._buscar_na_api_e_salvar_no_db(email, usuario.id),
+        )
+        # Os vazamentos podem ter acabado de ser gravados por esta ou por outra requisição.
+        usar_primario(self.db)
 
-        return self.buscar_vazamentos_no_banco(usuario.id)
+        return await self.buscar_vazamentos_no_banco(usuario.id)
 
 
-    def buscar_vazamentos_no_banco(self, usuario_id: uuid.UUID) -> list[models]:
+    async def _buscar_na_api_e_salvar_no_db(self, email: str, usuario_id: uuid.UUID):
         """
-        Busca vazamentos associados a um usuário no banco de dados.
-        Garante que o campo data_classes seja retornado como uma lista válida.
+        Consulta a API e salva os vazamentos do usuário. Executada uma única vez por usuário
+        entre requisições concorrentes; se outra execução já salvou os vazamentos, não faz nada.
         """
-        vazamentos = (
-            self.db.query(models.Vazamento)
-            .filter(usuario_id == models.Vazamento.usuario_id)
-            .order_by(desc(models.Vazamento.data_vazamento))
-            .all()
-        )
+        # A nova verificação precisa enxergar o que o dono anterior do lock acabou de gravar.
+        usar_primario(self.db)
+        vazamento_existente = await self.db.scalar(consulta_algum_vazamento_do_usuario(usuario_id))
+        if vazamento_existente:
+            return
 
-        for vazamento in vazamentos:
-            # Verifica se `data_classes` está armazenado como string e converte para lista
-            if isinstance(vazamento.data_classes, str):
-                try:
-                    vazamento.data_classes = json.loads(vazamento.data_classes)
-                except json.JSONDecodeError:
-                    vazamento.data_classes = []  # Caso não seja um JSON válido, retorna lista vazia
+        resultados_api = await buscar_vazamentos_na_api(email, self.cliente_hibp)
 
-        return vazamentos
+        if resultados_api:
+            await self.salvar_vazamentos_novos(
+                await self.catalogo_service.resolver_vazamentos(resultados_api), usuario_id
+            )
+            await registrar_escrita(usuario_id)
 
 
-    def criar_vazamento_no_banco_de_dados(self, vazamento_dados: dict, usuario_id: uuid.UUID):
+    async def buscar_vazamentos_no_banco(self, usuario_id: uuid.UUID) -> list[schemas.VazamentoResponse]:
         """
-        Salva um vazamento no banco de dados associado a um usuário.
+        Busca os vazamentos associados a um usuário, com os metadados do catálogo.
         """
-        novo_vazamento = models.Vazamento(
-            nome=vazamento_dados["nome"],
-            titulo=vazamento_dados["titulo"],
-            dominio_url=vazamento_dados["dominio_url"],
-            data_vazamento=vazamento_dados["data_vazamento"],
-            data_adicao=vazamento_dados["data_adicao"],
-            data_atualizacao=vazamento_dados["data_atualizacao"],
-            pwn_count=vazamento_dados["pwn_count"],
-            descricao=vazamento_dados.get("descricao", ""),
-            image_uri=vazamento_dados.get("image_uri", ""),
+        linhas = await self.db.execute(consulta_vazamentos_do_usuario(usuario_id))
+        return [self._montar_resposta(*linha, usuario_id) for linha in linhas.all()]
+
+
+    async def buscar_vazamentos_por_classes_de_dados(self, usuario_id: uuid.UUID,
+                                                     classes_de_dados: list[str]) -> list[schemas.VazamentoResponse]:
+        """
+        Busca os vazamentos do usuário que expõem todas as classes de dados informadas
+        (ex.: "Passwords"). O filtro é feito no banco, pelo índice GIN de `data_classes`.
+        """
+        linhas = await self.db.execute(consulta_vazamentos_do_usuario(usuario_id, classes_de_dados))
+        return [self._montar_resposta(*linha, usuario_id) for linha in linhas.all()]
+
+
+    @staticmethod
+    def _montar_resposta(vazamento: models.CatalogoVazamento, primeira_deteccao_em: Optional[datetime],
+                         usuario_id: uuid.UUID) -> schemas.VazamentoResponse:
+        return schemas.VazamentoResponse(
+            id=vazamento.id,
+            nome=vazamento.nome,
+            titulo=vazamento.titulo or vazamento.nome,
+            dominio_url=vazamento.dominio_url or "",
+            data_vazamento=vazamento.data_vazamento,
+            data_adicao=vazamento.data_adicao,
+            data_atualizacao=vazamento.data_atualizacao,
+            pwn_count=vazamento.pwn_count or 0,
+            descricao=vazamento.descricao,
+            image_uri=vazamento.image_uri,
+            data_classes=vazamento.data_classes,
             usuario_id=usuario_id,
+            primeira_deteccao_em=primeira_deteccao_em,
         )
 
-        novo_vazamento.set_data_classes(vazamento_dados.get("data_classes", []))
 
-        self.db.add(novo_vazamento)
-        self.db.commit()
-        self.db.refresh(novo_vazamento)
-        return novo_vazamento
+    async def listar_vazamentos_do_usuario(self, usuario_id: uuid.UUID, limite: int = PAGINACAO_LIMITE_PADRAO,
+                                           cursor: Optional[str] = None) -> schemas.PaginaVazamentos:
+        """
+        Lista os vazamentos do usuário do detectado mais recentemente para o mais antigo, paginando
+        por keyset (primeira detecção, id) a partir do `cursor` devolvido na página anterior.
+        """
+        apos = tuple(decodificar_cursor(cursor, datetime.fromisoformat, int)) if cursor else None
+        linhas = (await self.db.execute(consulta_pagina_vazamentos_do_usuario(usuario_id, limite, apos))).all()
+        itens = [self._montar_resposta(*linha, usuario_id) for linha in linhas[:limite]]
+
+        proximo_cursor = None
+        if len(linhas) > limite:
+            ultimo = itens[-1]
+            proximo_cursor = codificar_cursor(ultimo.primeira_deteccao_em.isoformat(), ultimo.id)
+        return schemas.PaginaVazamentos(itens=itens, proximo_cursor=proximo_cursor)
 
 
-    def get_all_vazamentos(self, skip: int = 0, limit: int = 100):
-        vazamentos = self.db.query(models.Vazamento).offset(skip).limit(limit).all()
+    async def listar_vazamentos(self, limite: int = PAGINACAO_LIMITE_PADRAO,
+                                cursor: Optional[str] = None) -> schemas.PaginaVazamentos:
+        """
+        Lista os vazamentos de todos os usuários paginando por keyset na chave primária
+        (usuario_id, catalogo_vazamento_id): o custo de cada página não cresce com a profundidade.
+        """
+        apos = tuple(decodificar_cursor(cursor, uuid.UUID, int)) if cursor else None
+        linhas = (await self.db.execute(consulta_pagina_vazamentos(limite, apos))).all()
+        itens = [self._montar_resposta(*linha) for linha in linhas[:limite]]
 
+        proximo_cursor = None
+        if len(linhas) > limite:
+            proximo_cursor = codificar_cursor(itens[-1].usuario_id, itens[-1].id)
+        return schemas.PaginaVazamentos(itens=itens, proximo_cursor=proximo_cursor)
 
-        for vazamento in vazamentos:
-            if isinstance(vazamento.data_classes, str):
-                try:
-                    vazamento.data_classes = json.loads(vazamento.data_classes)
-                except json.JSONDecodeError:
-                    vazamento.data_classes = []
 
-        return vazamentos
+    async def exportar_vazamentos(self, tamanho_lote: int = 1000) -> AsyncIterator[list[Row]]:
+        """
+        Percorre os vazamentos de todos os usuários com um cursor no servidor, em lotes de
+        `tamanho_lote` linhas, sem carregar o resultado inteiro na memória.
+        """
+        resultado = await self.db.stream(
+            select(
+                models.UsuarioVazamento.usuario_id,
+                models.CatalogoVazamento.nome,
+                models.CatalogoVazamento.titulo,
+                models.CatalogoVazamento.dominio_url,
+                models.CatalogoVazamento.data_vazamento,
+                models.CatalogoVazamento.pwn_count,
+                models.CatalogoVazamento.data_classes,
+                models.UsuarioVazamento.primeira_deteccao_em,
+            )
+            .join(models.CatalogoVazamento, models.UsuarioVazamento.catalogo_vazamento_id == models.CatalogoVazamento.id)
+            .order_by(models.UsuarioVazamento.usuario_id, models.UsuarioVazamento.catalogo_vazamento_id)
+            .execution_options(yield_per=tamanho_lote)
+        )
+        async for lote in resultado.partitions():
+            yield lote
 
 
-    async def obter_vazamentos_pelo_email_usuario_e_salva_no_db_sem_verificacao_local(self, email: str) -> list[schemas.VazamentoResponse]:
+    async def obter_vazamentos_pelo_email_usuario_e_salva_no_db_sem_verificacao_local(
+            self, email: str, ignorar_cache: bool = False, commit: bool = True) -> list[models.CatalogoVazamento]:
         """
         Obtém vazamentos de segurança associados a um e-mail, consultando a API,
-        e só salva no banco de dados aqueles que são novos (não estão no banco),
-        verificando os vazamentos pela combinação de 'Name' e 'BreachDate'. Retorna apenas
-        vazamentos novos
+        e só associa ao usuário aqueles que ele ainda não tem. Retorna apenas os
+        vazamentos novos. Com `ignorar_cache=True` a consulta não usa o cache do Redis.
+        Com `commit=False` a transação fica aberta para o chamador gravar mais dados junto.
         """
 
         usuario_service = UsuarioService(self.db)
-        usuario = usuario_service.obter_usuario_pelo_email(email)
-
-        resultados_api = await buscar_vazamentos_na_api(usuario.email)
-        novos_vazamentos = []
-
-        if resultados_api:
-            for vazamento_data in resultados_api:
+        usuario = await usuario_service.obter_usuario_pelo_email(email)
 
-                vazamento_existente = self.buscar_vazamento_por_nome_e_data(vazamento_data['Name'], vazamento_data['BreachDate'], usuario.id)
-
-                if not vazamento_existente:
-                    vazamento_salvo = self.criar_vazamento_no_banco_de_dados(processar_vazamento(vazamento_data), usuario.id)
-                    novos_vazamentos.append(vazamento_salvo)
+        resultados_api = await buscar_vazamentos_na_api(usuario.email, self.cliente_hibp, ignorar_cache)
+        if not resultados_api:
+            return []
 
+        vazamentos_dados = await self.catalogo_service.resolver_vazamentos(resultados_api)
+        novos_vazamentos = await self.salvar_vazamentos_novos(vazamentos_dados, usuario.id, commit)
+        if novos_vazamentos:
+            await registrar_escrita(usuario.id)
         return novos_vazamentos
 
 
-    def buscar_vazamento_por_nome_e_data(self, name: str, breach_date: str, usuario_id: uuid.UUID) -> models:
+    async def salvar_vazamentos_novos(self, vazamentos_dados: list[dict], usuario_id: uuid.UUID,
+                                      commit: bool = True) -> list[models.CatalogoVazamento]:
         """
-        Busca no banco de dados por um vazamento específico com o 'Name' e 'BreachDate' fornecidos e o id do usuário.
-        Retorna o vazamento se encontrado, ou None se não existir.
+        Associa ao usuário os vazamentos que ele ainda não tem. Os metadados ficam uma única vez
+        no catálogo; vazamentos ausentes dele (catálogo desatualizado) são registrados antes.
+        Cada associação é uma linha pequena inserida com ON CONFLICT DO NOTHING RETURNING.
+        Retorna as entradas do catálogo dos vazamentos novos para o usuário.
         """
-        return self.db.query(models.Vazamento).filter(
-            name == models.Vazamento.nome,
-            breach_date == models.Vazamento.data_vazamento,
-            usuario_id == models.Vazamento.usuario_id
-        ).first()
+        nomes = list(dict.fromkeys(vazamento_dados["nome"] for vazamento_dados in vazamentos_dados))
+        if not nomes:
+            return []
+
+        ids_por_nome = await self._obter_ids_do_catalogo(nomes)
+        ausentes = [dados for dados in vazamentos_dados if dados["nome"] not in ids_por_nome]
+        if ausentes:
+            await self.db.execute(
+                insert(models.CatalogoVazamento)
+                .values([self._linha_do_catalogo(dados) for dados in {d["nome"]: d for d in ausentes}.values()])
+                .on_conflict_do_nothing(index_elements=["nome"])
+            )
+            ids_por_nome = await self._obter_ids_do_catalogo(nomes)
+
+        stmt = (
+            insert(models.UsuarioVazamento)
+            .values([
+                {"usuario_id": usuario_id, "catalogo_vazamento_id": ids_por_nome[nome]}
+                for nome in nomes if nome in ids_por_nome
+            ])
+            .on_conflict_do_nothing()
+            .returning(models.UsuarioVazamento.catalogo_vazamento_id)
+        )
+        ids_novos = (await self.db.scalars(stmt)).all()
 
+        novos_vazamentos = []
+        if ids_novos:
+            novos_vazamentos = (await self.db.scalars(
+                select(models.CatalogoVazamento).where(models.CatalogoVazamento.id.in_(ids_novos))
+            )).all()
+        if commit:
+            await self.db.commit()
+        return novos_vazamentos
+
+
+    async def _obter_ids_do_catalogo(self, nomes: list[str]) -> dict[str, int]:
+        linhas = await self.db.execute(
+            select(models.CatalogoVazamento.nome, models.CatalogoVazamento.id)
+            .where(models.CatalogoVazamento.nome.in_(nomes))
+        )
+        return dict(linhas.tuples().all())
+
+
+    @staticmethod
+    def _linha_do_catalogo(vazamento_dados: dict) -> dict:
+        return {
+            "nome": vazamento_dados["nome"],
+            "titulo": vazamento_dados["titulo"],
+            "dominio_url": vazamento_dados["dominio_url"],
+            "data_vazamento": vazamento_dados["data_vazamento"],
+            "data_adicao": vazamento_dados["data_adicao"],
+            "data_atualizacao": vazamento_dados["data_atualizacao"],
+            "pwn_count": vazamento_dados["pwn_count"],
+            "descricao": vazamento_dados.get("descricao", ""),
+            "image_uri": vazamento_dados.get("image_uri", ""),
+            "data_classes": vazamento_dados.get("data_classes", []),
+        }
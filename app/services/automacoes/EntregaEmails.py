@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import os
+
+from app.db.database import AsyncSessionLocal
+from app.db.redis.metricas_automacao import incrementar_metrica
+from app.services.EmailPendenteService import EmailPendenteService
+from app.services.EmailService import montar_email, pool_smtp
+
+EMAIL_TAMANHO_LOTE = int(os.getenv("EMAIL_TAMANHO_LOTE", "50"))
+# Limite de lotes por execução do job, para que a entrega não monopolize o worker.
+EMAIL_MAX_LOTES_POR_EXECUCAO = int(os.getenv("EMAIL_MAX_LOTES_POR_EXECUCAO", "20"))
+
+
+async def entregar_emails_pendentes():
+    """
+    Esvazia a caixa de saída em lotes. As mensagens de um lote são enviadas em paralelo,
+    limitadas pelo tamanho do pool SMTP; falhas são reagendadas com backoff exponencial.
+    """
+    for _ in range(EMAIL_MAX_LOTES_POR_EXECUCAO):
+        async with AsyncSessionLocal() as db:
+            try:
+                email_service = EmailPendenteService(db)
+                lote, origens_descartadas = await email_service.reivindicar_lote(EMAIL_TAMANHO_LOTE)
+                for origem in origens_descartadas:
+                    if origem:
+                        await incrementar_metrica("emails_falhos", chave=origem)
+                if not lote:
+                    if origens_descartadas:
+                        continue
+                    return
+
+                resultados = await asyncio.gather(
+                    *(pool_smtp.enviar(montar_email(destinatario, assunto, corpo_html))
+                      for _, _, destinatario, assunto, corpo_html, _ in lote),
+                    return_exceptions=True,
+                )
+
+                enviados = []
+                for (email_id, tentativas, _, _, _, origem), resultado in zip(lote, resultados):
+                    if isinstance(resultado, Exception):
+                        descartado = await email_service.registrar_falha(email_id, tentativas, str(resultado))
+                        if origem:
+                            await incrementar_metrica(
+                                "emails_falhos" if descartado else "emails_tentativas_falhas", chave=origem
+                            )
+                    else:
+                        enviados.append(email_id)
+                        if origem:
+                            await incrementar_metrica("emails_enviados", chave=origem)
+                await email_service.marcar_enviados(enviados)
+                logging.info(f"Caixa de saída: {len(enviados)} e-mails enviados, {len(lote) - len(enviados)} falhas.")
+            except Exception as e:
+                logging.error(f"Erro durante a entrega dos e-mails pendentes: {e}")
+                return
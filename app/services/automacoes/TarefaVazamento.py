@@ -1,17 +1,77 @@
 import logging
+import os
+from datetime import datetime
 
 import pytz
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
-from app.services.automacoes.VazamentoAutomacao import automatizar_notificacao_vazamentos
+from app.db.redis.leader_lock import AGENDADOR_LIDER_INTERVALO_RENOVACAO, eleicao_agendador, somente_lider
+from app.services.automacoes.EntregaEmails import entregar_emails_pendentes
+from app.services.automacoes.VazamentoAutomacao import (
+    automatizar_notificacao_vazamentos,
+    retomar_execucao_pendente,
+    sincronizar_catalogo_vazamentos,
+    verificar_usuarios_pendentes,
+    VERIFICACAO_INTERVALO_SEGUNDOS,
+)
 
+CATALOGO_INTERVALO_HORAS = int(os.getenv("CATALOGO_INTERVALO_HORAS", "6"))
+AUTOMACAO_INTERVALO_RETOMADA_MINUTOS = int(os.getenv("AUTOMACAO_INTERVALO_RETOMADA_MINUTOS", "5"))
+EMAIL_INTERVALO_ENTREGA_SEGUNDOS = int(os.getenv("EMAIL_INTERVALO_ENTREGA_SEGUNDOS", "30"))
+# "semanal" (padrão) mantém a execução de domingo: todos os usuários são consultados de uma vez,
+# com o pico de chamadas à HIBP, e quem acabou de ativar as notificações espera até domingo.
+# "continua" espalha as verificações ao longo do período e verifica primeiro quem acabou de ativar.
+VERIFICACAO_MODO = os.getenv("VERIFICACAO_MODO", "semanal").lower()
+VERIFICACAO_JITTER_SEGUNDOS = int(os.getenv("VERIFICACAO_JITTER_SEGUNDOS", "10"))
 
-def iniciar_agendador():
+
+async def iniciar_agendador():
+    """
+    Inicia o agendador em todos os processos. Iniciar execuções e sincronizar o catálogo
+    cabe apenas ao líder; retomar shards pendentes e entregar e-mails é dividido entre
+    todos os processos por leases e SKIP LOCKED.
+    """
     brt = pytz.timezone("America/Sao_Paulo")
+    await eleicao_agendador.renovar()
     scheduler = AsyncIOScheduler()
-    trigger = CronTrigger(day_of_week="sun", hour=20, minute=00, timezone=brt)
-    scheduler.add_job(automatizar_notificacao_vazamentos, trigger)
+    scheduler.add_job(
+        eleicao_agendador.renovar,
+        IntervalTrigger(seconds=AGENDADOR_LIDER_INTERVALO_RENOVACAO, timezone=brt),
+    )
+    if VERIFICACAO_MODO == "continua":
+        # Executada só no líder para que a taxa alvo não seja multiplicada pelo número de processos.
+        scheduler.add_job(
+            somente_lider(verificar_usuarios_pendentes),
+            IntervalTrigger(seconds=VERIFICACAO_INTERVALO_SEGUNDOS, jitter=VERIFICACAO_JITTER_SEGUNDOS, timezone=brt),
+        )
+    else:
+        trigger = CronTrigger(day_of_week="sun", hour=20, minute=00, timezone=brt)
+        scheduler.add_job(somente_lider(automatizar_notificacao_vazamentos), trigger)
+    scheduler.add_job(
+        somente_lider(sincronizar_catalogo_vazamentos),
+        IntervalTrigger(hours=CATALOGO_INTERVALO_HORAS, timezone=brt),
+        next_run_time=datetime.now(brt),
+    )
+    scheduler.add_job(
+        retomar_execucao_pendente,
+        IntervalTrigger(minutes=AUTOMACAO_INTERVALO_RETOMADA_MINUTOS, timezone=brt),
+        next_run_time=datetime.now(brt),
+    )
+    scheduler.add_job(
+        entregar_emails_pendentes,
+        IntervalTrigger(seconds=EMAIL_INTERVALO_ENTREGA_SEGUNDOS, timezone=brt),
+    )
     scheduler.start()
-    logging.info("Agendador iniciado. Próxima execução programada para domingo às 20:00.")
+    if VERIFICACAO_MODO == "continua":
+        logging.info(f"Agendador iniciado. Verificação contínua a cada {VERIFICACAO_INTERVALO_SEGUNDOS} segundos.")
+    else:
+        logging.info("Agendador iniciado. Próxima execução programada para domingo às 20:00.")
+    logging.info(f"Sincronização do catálogo de vazamentos programada a cada {CATALOGO_INTERVALO_HORAS} horas.")
     return scheduler
+
+
+async def encerrar_agendador(scheduler: AsyncIOScheduler):
+    scheduler.shutdown()
+    await eleicao_agendador.liberar()
@@ -1,92 +1,337 @@
+import asyncio
 import logging
-from app.db.database import SessionLocal, get_db_session
-from app.services import EmailService
+import math
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterable, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from app.db.database import AsyncSessionLocal
+from app.db.redis.metricas_automacao import MetricasExecucao, incrementar_metrica, metricas_atuais, usar_metricas
+from app.models.automacoes.models import ExecucaoAutomacao
+from app.services.CatalogoVazamentoService import CatalogoVazamentoService
+from app.services.EmailPendenteService import EmailPendenteService
+from app.services.ExecucaoAutomacaoService import ExecucaoAutomacaoService, limites_do_shard, AUTOMACAO_LEASE_SEGUNDOS
 from app.services.UsuarioService import UsuarioService
 from app.services.VazamentoService import VazamentoService
+from app.utils.HibpClient import obter_cliente_hibp
+from app.utils.TemplatesEmail import renderizar_notificacao_vazamentos
+
+# Usuários processados em paralelo. As chamadas à HIBP continuam limitadas pelo limitador compartilhado.
+AUTOMACAO_CONCORRENCIA = int(os.getenv("AUTOMACAO_CONCORRENCIA", "10"))
+# Usuários por checkpoint: uma retomada reprocessa no máximo um lote.
+AUTOMACAO_TAMANHO_LOTE = int(os.getenv("AUTOMACAO_TAMANHO_LOTE", "100"))
+
+# Verificação contínua: cada usuário é verificado uma vez por período, distribuído ao longo dele.
+VERIFICACAO_PERIODO_HORAS = float(os.getenv("VERIFICACAO_PERIODO_HORAS", "168"))
+VERIFICACAO_INTERVALO_SEGUNDOS = int(os.getenv("VERIFICACAO_INTERVALO_SEGUNDOS", "60"))
+# Taxa alvo fixa; com 0, a taxa é calculada para cobrir todos os usuários dentro do período.
+VERIFICACAO_USUARIOS_POR_MINUTO = float(os.getenv("VERIFICACAO_USUARIOS_POR_MINUTO", "0"))
+# Atraso para tentar novamente um usuário cuja verificação falhou.
+VERIFICACAO_ATRASO_FALHA_MINUTOS = int(os.getenv("VERIFICACAO_ATRASO_FALHA_MINUTOS", "30"))
+
+T = TypeVar("T")
 
 
 def gerar_mensagem_html_multi(usuario_nome: str, vazamentos: list):
-    vazamentos_html = "".join([
-        f"""
-        <div class="vazamento-item">
-            <h3>{vazamento['titulo']}</h3>
-            <p><strong>Data:</strong> {vazamento['data']}</p>
-            <p><strong>Descrição:</strong> {vazamento['descricao']}</p>
-            <div class="image-container">
-                <img src="{vazamento['image_uri']}" alt="Imagem do Vazamento">
-            </div>
-        </div>
-        """
-        for vazamento in vazamentos
-    ])
-
-    return f"""
-    <!DOCTYPE html>
-    <html lang="pt-br">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Notificação de Vazamentos</title>
-        <style>
-            body {{ font-family: 'Arial', sans-serif; background-color: #f4f4f9; margin: 0; padding: 0; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; background-color: #ffffff; }}
-            .header {{ background-color: #4CAF50; color: white; text-align: center; padding: 10px; }}
-            .vazamento-item {{ border-bottom: 1px solid #ddd; padding: 15px 0; }}
-            .vazamento-item img {{ max-width: 100%; border-radius: 8px; }}
-            .footer {{ text-align: center; color: #888888; margin-top: 20px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h2>Notificação de Vazamentos</h2>
-            </div>
-            <p>Olá {usuario_nome},</p>
-            <p>Identificamos os seguintes vazamentos relacionados ao seu e-mail:</p>
-            {vazamentos_html}
-            <div class="footer">
-                <p>Atenciosamente,</p>
-                <p><strong>Equipe de Segurança Start Osinc Sec - SOS</strong></p>
-            </div>
-        </div>
-    </body>
-    </html>
+    return renderizar_notificacao_vazamentos(usuario_nome, vazamentos)
+
+
+async def processar_em_paralelo(itens: Iterable[T], funcao: Callable[[T], Awaitable[None]], concorrencia: int) -> dict:
+    """
+    Executa `funcao` para cada item com no máximo `concorrencia` execuções simultâneas.
+    A falha de um item é registrada e não interrompe os demais. Retorna a contagem de
+    itens processados e de falhas.
     """
+    fila: asyncio.Queue = asyncio.Queue(maxsize=concorrencia * 2)
+    resultado = {"processados": 0, "falhas": 0}
+
+    async def trabalhador():
+        while True:
+            item = await fila.get()
+            if item is None:
+                return
+            try:
+                await funcao(item)
+                resultado["processados"] += 1
+                await incrementar_metrica("usuarios_processados")
+            except Exception as e:
+                resultado["falhas"] += 1
+                logging.error(f"Erro ao processar item {item} da automação: {e}")
+                await incrementar_metrica("usuarios_com_falha")
+
+    trabalhadores = [asyncio.create_task(trabalhador()) for _ in range(concorrencia)]
+    try:
+        for item in itens:
+            await fila.put(item)
+        for _ in trabalhadores:
+            await fila.put(None)
+        await asyncio.gather(*trabalhadores)
+    finally:
+        for tarefa in trabalhadores:
+            tarefa.cancel()
+    return resultado
+
+
+async def notificar_novos_vazamentos_do_usuario(usuario: tuple):
+    """
+    Consulta a API, salva os vazamentos novos do usuário e enfileira o e-mail de notificação
+    com todos eles. Cada usuário usa a sua própria sessão do banco de dados.
+    """
+    usuario_id, usuario_nome, usuario_email = usuario
+    async with AsyncSessionLocal() as db:
+        vazamento_service = VazamentoService(db, await obter_cliente_hibp())
+        try:
+            vazamentos = await vazamento_service.obter_vazamentos_pelo_email_usuario_e_salva_no_db_sem_verificacao_local(
+                usuario_email, ignorar_cache=True, commit=False
+            )
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+            vazamentos = []
+
+        if vazamentos:
+            vazamentos_formatados = [
+                {
+                    "titulo": vazamento.titulo,
+                    "data": vazamento.data_vazamento.strftime('%d/%m/%Y') if vazamento.data_vazamento else "-",
+                    "descricao": vazamento.descricao,
+                    "image_uri": vazamento.image_uri
+                }
+                for vazamento in vazamentos
+            ]
+
+            mensagem_html = gerar_mensagem_html_multi(usuario_nome, vazamentos_formatados)
+            assunto = f"Notificação de Vazamentos: {len(vazamentos)} novos"
+            # O e-mail entra na caixa de saída na mesma transação dos novos vazamentos.
+            metricas = metricas_atuais()
+            EmailPendenteService(db).enfileirar_email(
+                usuario_email, assunto, mensagem_html, origem=metricas.chave if metricas else None
+            )
+            logging.info(f"E-mail para {usuario_email} com {len(vazamentos)} vazamentos adicionado à caixa de saída.")
+        else:
+            logging.info(f"Nenhum novo vazamento encontrado para o usuário: {usuario_email}")
+
+        await UsuarioService(db).marcar_usuario_verificado(usuario_id)
+        await db.commit()
+
+    if vazamentos:
+        await incrementar_metrica("vazamentos_novos", len(vazamentos))
+        await incrementar_metrica("emails_enfileirados")
+
+
+def calcular_cota_de_verificacao(total_usuarios: int) -> int:
+    """
+    Quantidade de usuários a verificar por execução para manter a taxa alvo.
+    """
+    if VERIFICACAO_USUARIOS_POR_MINUTO > 0:
+        return max(1, math.ceil(VERIFICACAO_USUARIOS_POR_MINUTO * VERIFICACAO_INTERVALO_SEGUNDOS / 60))
+    periodo_segundos = VERIFICACAO_PERIODO_HORAS * 3600
+    return max(1, math.ceil(total_usuarios * VERIFICACAO_INTERVALO_SEGUNDOS / periodo_segundos))
+
+
+async def verificar_usuarios_pendentes():
+    """
+    Verificação contínua: a cada intervalo, verifica a cota de usuários com a verificação mais
+    antiga, priorizando quem nunca foi verificado. Substitui o pico semanal por uma carga constante
+    na API HIBP e no SMTP.
+    """
+    with usar_metricas(f"continua:{datetime.utcnow().date().isoformat()}") as metricas:
+        await _verificar_usuarios_pendentes(metricas)
+
+
+async def _verificar_usuarios_pendentes(metricas: MetricasExecucao):
+    async with AsyncSessionLocal() as db:
+        usuario_service = UsuarioService(db)
+        cota = calcular_cota_de_verificacao(await usuario_service.contar_usuarios_com_notificacoes_ativadas())
+        verificados_antes = datetime.utcnow() - timedelta(hours=VERIFICACAO_PERIODO_HORAS)
+        usuarios = await usuario_service.reivindicar_usuarios_para_verificacao(cota, verificados_antes)
+
+    if not usuarios:
+        return
+    logging.info(f"Verificação contínua: {len(usuarios)} usuários reivindicados (cota {cota}).")
+
+    falhas = []
+
+    async def verificar_usuario(usuario: tuple):
+        try:
+            await notificar_novos_vazamentos_do_usuario(usuario)
+        except Exception:
+            falhas.append(usuario[0])
+            raise
+
+    async with metricas.fase("verificacao"):
+        await processar_em_paralelo(usuarios, verificar_usuario, AUTOMACAO_CONCORRENCIA)
+
+    if falhas:
+        # A reivindicação já marcou esses usuários como verificados; antecipa a próxima tentativa.
+        nova_tentativa_em = (
+            datetime.utcnow() - timedelta(hours=VERIFICACAO_PERIODO_HORAS)
+            + timedelta(minutes=VERIFICACAO_ATRASO_FALHA_MINUTOS)
+        )
+        async with AsyncSessionLocal() as db:
+            usuario_service = UsuarioService(db)
+            for usuario_id in falhas:
+                await usuario_service.marcar_usuario_verificado(usuario_id, nova_tentativa_em)
+            await db.commit()
+        logging.warning(f"Verificação contínua: {len(falhas)} usuários falharam e serão tentados novamente.")
 
 
 async def automatizar_notificacao_vazamentos():
+    """
+    Inicia a execução semanal da automação ou retoma a execução interrompida e participa dela.
+    """
     logging.info("Iniciando a tarefa de notificação de vazamentos.")
+    async with AsyncSessionLocal() as db:
+        try:
+            execucao_service = ExecucaoAutomacaoService(db)
+            execucao = await execucao_service.obter_execucao_em_andamento()
+            duracao_sincronizacao = None
+            if execucao is None:
+                novidades_desde = await execucao_service.obter_inicio_da_ultima_execucao_bem_sucedida()
+                if novidades_desde is not None:
+                    inicio = time.perf_counter()
+                    houve_novidades = await _houve_novidades_no_catalogo(db, novidades_desde)
+                    duracao_sincronizacao = round(time.perf_counter() - inicio, 3)
+                    if not houve_novidades:
+                        await execucao_service.registrar_execucao_ignorada(
+                            novidades_desde, {"fases_segundos": {"sincronizacao_catalogo": duracao_sincronizacao}}
+                        )
+                        logging.info(f"Nenhum vazamento publicado desde {novidades_desde}. Varredura dos usuários ignorada.")
+                        return
+                execucao = await execucao_service.obter_ou_criar_execucao(novidades_desde)
+            execucao_id = execucao.id
+        except Exception as e:
+            logging.error(f"Erro ao iniciar a execução da automação: {e}")
+            return
+
+    if duracao_sincronizacao is not None:
+        await MetricasExecucao(f"execucao:{execucao_id}").incrementar(
+            "fase:sincronizacao_catalogo:segundos", duracao_sincronizacao
+        )
+    await participar_da_execucao(execucao_id)
+
+
+async def retomar_execucao_pendente():
+    """
+    Participa de uma execução em andamento, se existir. Agendada em todos os processos, permite que
+    vários workers dividam os shards e que uma execução interrompida seja retomada.
+    """
+    async with AsyncSessionLocal() as db:
+        execucao = await ExecucaoAutomacaoService(db).obter_execucao_em_andamento()
+        execucao_id = execucao.id if execucao else None
+
+    if execucao_id is not None:
+        await participar_da_execucao(execucao_id)
+
+
+async def _houve_novidades_no_catalogo(db, desde: datetime) -> bool:
+    """
+    Sincroniza o catálogo e verifica se algum vazamento foi publicado ou alterado desde `desde`.
+    Se a sincronização falhar, assume que houve novidades para não perder notificações.
+    """
+    catalogo_service = CatalogoVazamentoService(db, await obter_cliente_hibp())
     try:
-        db = next(get_db_session())
-        usuario_service = UsuarioService(db)
-        usuarios_com_notificacoes = usuario_service.obter_lista_de_usuarios_com_notifacao_ativadas()
-        if not usuarios_com_notificacoes:
-            logging.info("Nenhum usuário com notificações ativas foi encontrado.")
+        await catalogo_service.sincronizar_catalogo()
+    except Exception as e:
+        logging.error(f"Erro ao sincronizar o catálogo antes da execução: {e}. Executando a varredura completa.")
+        return True
+    return await catalogo_service.obter_ultima_publicacao_desde(desde) is not None
+
+
+async def _obter_corte_de_verificacao(db, execucao: ExecucaoAutomacao) -> Optional[datetime]:
+    """
+    Usuários verificados depois da publicação mais recente desde a última execução já receberam
+    todos os vazamentos novos e podem ser ignorados. Sem execução anterior, todos são verificados.
+    """
+    if execucao.novidades_desde is None:
+        return None
+    ultima_publicacao = await CatalogoVazamentoService(db).obter_ultima_publicacao_desde(execucao.novidades_desde)
+    return ultima_publicacao or execucao.novidades_desde
+
+
+async def participar_da_execucao(execucao_id: int):
+    with usar_metricas(f"execucao:{execucao_id}") as metricas:
+        await _participar_da_execucao(execucao_id, metricas)
+
+
+async def _participar_da_execucao(execucao_id: int, metricas: MetricasExecucao):
+    dono = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    async with AsyncSessionLocal() as db:
+        execucao = await db.get(ExecucaoAutomacao, execucao_id)
+        if execucao is None:
             return
+        total_shards = execucao.total_shards
+        verificados_antes = await _obter_corte_de_verificacao(db, execucao)
 
-        vazamento_service = VazamentoService(db)
-        for usuario in usuarios_com_notificacoes:
-            vazamentos = await vazamento_service.obter_vazamentos_pelo_email_usuario_e_salva_no_db_sem_verificacao_local(
-                usuario.email
+    while True:
+        async with AsyncSessionLocal() as db:
+            execucao_service = ExecucaoAutomacaoService(db)
+            shard = await execucao_service.reivindicar_shard(execucao_id, dono)
+            if shard is None:
+                if await execucao_service.finalizar_execucao_se_concluida(execucao_id):
+                    await execucao_service.salvar_metricas(execucao_id, await metricas.obter())
+                return
+            shard_id, numero, ultimo_usuario_id = shard.id, shard.numero, shard.ultimo_usuario_id
+
+        async with metricas.fase("processamento_shards"):
+            await processar_shard(shard_id, numero, total_shards, ultimo_usuario_id, dono, verificados_antes)
+
+
+async def processar_shard(shard_id: int, numero: int, total_shards: int, ultimo_usuario_id: Optional[uuid.UUID],
+                          dono: str, verificados_antes: Optional[datetime] = None):
+    """
+    Processa os usuários do shard em lotes, gravando um checkpoint ao fim de cada lote.
+    Com `verificados_antes`, só os usuários não verificados desde essa data são consultados.
+    Um heartbeat renova o lease enquanto o lote está em processamento.
+    """
+    inicio, fim = limites_do_shard(numero, total_shards)
+    lease_perdido = asyncio.Event()
+    heartbeat = asyncio.create_task(_manter_lease(shard_id, dono, lease_perdido))
+    logging.info(f"Processando shard {numero} a partir do usuário {ultimo_usuario_id or inicio}.")
+
+    try:
+        async with AsyncSessionLocal() as db:
+            execucao_service = ExecucaoAutomacaoService(db)
+            lotes = UsuarioService(db).iterar_lotes_de_usuarios_com_notificacoes_ativadas(
+                inicio, fim, ultimo_usuario_id, AUTOMACAO_TAMANHO_LOTE, verificados_antes
             )
+            async for lote in lotes:
+                resultado = await processar_em_paralelo(lote, notificar_novos_vazamentos_do_usuario,
+                                                        AUTOMACAO_CONCORRENCIA)
+                checkpoint_gravado = await execucao_service.registrar_checkpoint(
+                    shard_id, dono, lote[-1].id, resultado["processados"], resultado["falhas"]
+                )
+                if not checkpoint_gravado or lease_perdido.is_set():
+                    logging.warning(f"Lease do shard {numero} perdido. Outro worker continuará a partir do último checkpoint.")
+                    return
 
-            if vazamentos:
-                vazamentos_formatados = [
-                    {
-                        "titulo": vazamento.titulo,
-                        "data": vazamento.data_vazamento.strftime('%d/%m/%Y'),
-                        "descricao": vazamento.descricao,
-                        "image_uri": vazamento.image_uri
-                    }
-                    for vazamento in vazamentos
-                ]
-
-                mensagem_html = gerar_mensagem_html_multi(usuario.nome, vazamentos_formatados)
-                assunto = f"Notificação de Vazamentos: {len(vazamentos)} novos"
-                await EmailService.enviar_email(usuario.email, assunto, mensagem_html)
-                logging.info(f"E-mail enviado para {usuario.email} com {len(vazamentos)} vazamentos.")
-            else:
-                logging.info(f"Nenhum novo vazamento encontrado para o usuário: {usuario.email}")
+            await execucao_service.concluir_shard(shard_id, dono)
+            logging.info(f"Shard {numero} concluído.")
+    finally:
+        heartbeat.cancel()
 
-    except Exception as e:
-        logging.error(f"Erro durante a execução da automação: {e}")
+
+async def _manter_lease(shard_id: int, dono: str, lease_perdido: asyncio.Event):
+    while True:
+        await asyncio.sleep(AUTOMACAO_LEASE_SEGUNDOS / 3)
+        async with AsyncSessionLocal() as db:
+            try:
+                if not await ExecucaoAutomacaoService(db).renovar_lease(shard_id, dono):
+                    lease_perdido.set()
+                    return
+            except Exception as e:
+                logging.error(f"Erro ao renovar o lease do shard {shard_id}: {e}")
+
+
+async def sincronizar_catalogo_vazamentos():
+    logging.info("Iniciando a sincronização do catálogo de vazamentos.")
+    async with AsyncSessionLocal() as db:
+        try:
+            await CatalogoVazamentoService(db, await obter_cliente_hibp()).sincronizar_catalogo()
+        except Exception as e:
+            logging.error(f"Erro durante a sincronização do catálogo de vazamentos: {e}")
@@ -0,0 +1,77 @@
+import logging
+import os
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HIBP_API_KEY = os.getenv("HIBP_API_KEY")
+
+if not HIBP_API_KEY:
+    raise RuntimeError("Chave de API não configurada corretamente!")
+
+HEADERS = {
+    "HIBP-API-Key": HIBP_API_KEY,
+    "User-Agent": "Osint Cyber",
+}
+
+HIBP_MAX_CONEXOES = int(os.getenv("HIBP_MAX_CONEXOES", "20"))
+HIBP_MAX_CONEXOES_KEEPALIVE = int(os.getenv("HIBP_MAX_CONEXOES_KEEPALIVE", "10"))
+HIBP_KEEPALIVE_EXPIRACAO = float(os.getenv("HIBP_KEEPALIVE_EXPIRACAO", "30"))
+HIBP_TIMEOUT_CONEXAO = float(os.getenv("HIBP_TIMEOUT_CONEXAO", "5"))
+HIBP_TIMEOUT_LEITURA = float(os.getenv("HIBP_TIMEOUT_LEITURA", "15"))
+HIBP_TIMEOUT_POOL = float(os.getenv("HIBP_TIMEOUT_POOL", "10"))
+HIBP_HTTP2 = os.getenv("HIBP_HTTP2", "false").lower() == "true"
+
+_cliente_hibp: Optional[httpx.AsyncClient] = None
+
+
+def criar_cliente_hibp() -> httpx.AsyncClient:
+    """
+    Cria o cliente HTTP compartilhado da API Have I Been Pwned, com pool de conexões,
+    keep-alive e timeouts configuráveis pelas variáveis de ambiente HIBP_*.
+    """
+    limites = httpx.Limits(
+        max_connections=HIBP_MAX_CONEXOES,
+        max_keepalive_connections=HIBP_MAX_CONEXOES_KEEPALIVE,
+        keepalive_expiry=HIBP_KEEPALIVE_EXPIRACAO,
+    )
+    timeout = httpx.Timeout(
+        connect=HIBP_TIMEOUT_CONEXAO,
+        read=HIBP_TIMEOUT_LEITURA,
+        write=HIBP_TIMEOUT_LEITURA,
+        pool=HIBP_TIMEOUT_POOL,
+    )
+    return httpx.AsyncClient(headers=HEADERS, limits=limites, timeout=timeout, http2=HIBP_HTTP2)
+
+
+def iniciar_cliente_hibp() -> httpx.AsyncClient:
+    global _cliente_hibp
+    if _cliente_hibp is None or _cliente_hibp.is_closed:
+        _cliente_hibp = criar_cliente_hibp()
+        logging.info(
+            f"Cliente HIBP iniciado (max_conexoes={HIBP_MAX_CONEXOES}, "
+            f"keepalive={HIBP_MAX_CONEXOES_KEEPALIVE}, http2={HIBP_HTTP2})."
+        )
+    return _cliente_hibp
+
+
+async def encerrar_cliente_hibp():
+    global _cliente_hibp
+    if _cliente_hibp is not None:
+        await _cliente_hibp.aclose()
+        _cliente_hibp = None
+        logging.info("Cliente HIBP encerrado.")
+
+
+async def obter_cliente_hibp() -> httpx.AsyncClient:
+    """
+    Retorna o cliente HIBP da aplicação. Se ainda não foi iniciado (ex.: execução fora da API),
+    cria o cliente sob demanda.
+    """
+    global _cliente_hibp
+    if _cliente_hibp is None or _cliente_hibp.is_closed:
+        _cliente_hibp = criar_cliente_hibp()
+    return _cliente_hibp
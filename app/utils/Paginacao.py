@@ -0,0 +1,29 @@
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException
+
+PAGINACAO_LIMITE_PADRAO = 50
+PAGINACAO_LIMITE_MAXIMO = 500
+
+
+def codificar_cursor(*valores) -> str:
+    """
+    Gera um cursor opaco com os valores da chave de ordenação do último item da página.
+    """
+    return base64.urlsafe_b64encode(json.dumps(valores, default=str).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, *conversores) -> list:
+    """
+    Recupera os valores gravados por `codificar_cursor`, aplicando um conversor a cada um
+    (ex.: `int`, `uuid.UUID`). Cursores adulterados ou de outra listagem resultam em 400.
+    """
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(valores, list) or len(valores) != len(conversores):
+            raise ValueError
+        return [converter(valor) for converter, valor in zip(conversores, valores)]
+    except (AttributeError, binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
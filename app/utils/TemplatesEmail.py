@@ -0,0 +1,92 @@
+import logging
+import os
+from functools import lru_cache
+from html.parser import HTMLParser
+from typing import Optional
+
+from mako.lookup import TemplateLookup
+
+DIRETORIO_TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "emails")
+
+# Fragmentos de vazamento renderizados mantidos em memória; um por vazamento distinto do catálogo.
+TEMPLATES_CACHE_FRAGMENTOS = int(os.getenv("TEMPLATES_CACHE_FRAGMENTOS", "4096"))
+
+TEMPLATES_EMAIL = [
+    "notificacao_vazamentos.html",
+    "fragmento_vazamento.html",
+    "notificacao_demonstrativo.html",
+]
+
+# O filtro "h" escapa toda expressão ${...}; HTML já renderizado usa explicitamente "| n".
+_lookup = TemplateLookup(
+    directories=[DIRETORIO_TEMPLATES],
+    default_filters=["h"],
+    input_encoding="utf-8",
+    strict_undefined=True,
+)
+
+
+def carregar_templates():
+    """
+    Compila os templates de e-mail uma única vez, na inicialização da aplicação.
+    """
+    for nome in TEMPLATES_EMAIL:
+        _lookup.get_template(nome)
+    logging.info(f"{len(TEMPLATES_EMAIL)} templates de e-mail compilados.")
+
+
+class _ExtratorDeTexto(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.partes = []
+
+    def handle_data(self, data: str):
+        self.partes.append(data)
+
+
+def remover_html(texto: Optional[str]) -> str:
+    """
+    As descrições da HIBP contêm HTML (links, ênfases). Mantém apenas o texto,
+    que depois é escapado pelo template.
+    """
+    if not texto:
+        return ""
+    extrator = _ExtratorDeTexto()
+    extrator.feed(texto)
+    extrator.close()
+    return "".join(extrator.partes).strip()
+
+
+@lru_cache(maxsize=TEMPLATES_CACHE_FRAGMENTOS)
+def renderizar_fragmento_vazamento(titulo: str, data: str, descricao: Optional[str], image_uri: Optional[str]) -> str:
+    """
+    Renderiza o bloco HTML de um vazamento. O resultado é reaproveitado por todos os
+    usuários afetados pelo mesmo vazamento.
+    """
+    return _lookup.get_template("fragmento_vazamento.html").render(
+        titulo=titulo or "",
+        data=data,
+        descricao=remover_html(descricao),
+        image_uri=image_uri or "",
+    )
+
+
+def renderizar_notificacao_vazamentos(usuario_nome: str, vazamentos: list[dict]) -> str:
+    vazamentos_html = "".join(
+        renderizar_fragmento_vazamento(
+            vazamento["titulo"], vazamento["data"], vazamento["descricao"], vazamento["image_uri"]
+        )
+        for vazamento in vazamentos
+    )
+    return _lookup.get_template("notificacao_vazamentos.html").render(
+        usuario_nome=usuario_nome, vazamentos_html=vazamentos_html
+    )
+
+
+def renderizar_notificacao_demonstrativo(titulo_vazamento: str, data: str, descricao: str, image_uri: str) -> str:
+    return _lookup.get_template("notificacao_demonstrativo.html").render(
+        titulo_vazamento=titulo_vazamento,
+        data=data,
+        descricao=remover_html(descricao),
+        image_uri=image_uri or "",
+    )
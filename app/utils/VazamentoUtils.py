@@ -1,4 +1,7 @@
+import hashlib
+import logging
 import os
+import time
 from datetime import datetime
 from typing import Optional
 
@@ -6,130 +9,32 @@ import httpx
 from dotenv import load_dotenv
 from fastapi import HTTPException
 
+from app.db.redis.metricas_automacao import metricas_atuais
+from app.db.redis.rate_limiter import limitador_hibp
+from app.db.redis.redis_cache import get_cache, set_cache
 from app.services.EmailService import enviar_email
+from app.utils.HibpClient import obter_cliente_hibp
+from app.utils.TemplatesEmail import renderizar_notificacao_demonstrativo
 
 
 load_dotenv()
-HIBP_API_KEY = os.getenv("HIBP_API_KEY")
 
-if not HIBP_API_KEY:
-    raise RuntimeError("Chave de API não configurada corretamente!")
+# Pode apontar para um servidor local (Scripts/hibp_stub.py) em testes de carga e benchmarks.
+API_BASE_URL = os.getenv("HIBP_API_BASE_URL", "https://haveibeenpwned.com/api/v3").rstrip("/")
+API_URL_TEMPLATE = API_BASE_URL + "/breachedaccount/{email}?truncateResponse=true"
+API_URL_CATALOGO = API_BASE_URL + "/breaches"
 
-HEADERS = {
-    "HIBP-API-Key": HIBP_API_KEY,
-    "User-Agent": "Osint Cyber",
-}
+HIBP_MAX_TENTATIVAS_429 = int(os.getenv("HIBP_MAX_TENTATIVAS_429", "5"))
+HIBP_RETRY_AFTER_PADRAO = 2.0
 
-API_URL_TEMPLATE = "https://haveibeenpwned.com/api/v3/breachedaccount/{email}?truncateResponse=false"
+HIBP_CACHE_TTL_POSITIVO = int(os.getenv("HIBP_CACHE_TTL_POSITIVO", "21600"))
+HIBP_CACHE_TTL_NEGATIVO = int(os.getenv("HIBP_CACHE_TTL_NEGATIVO", "3600"))
 
 
 
 async def notificar_vazamento_usuario_por_email_demonstrativo(email_usuario: str, titulo_vazamento: str, data: str,
                                                               descricao: str, image_uri: str):
-    mensagem_html = f"""
-    <!DOCTYPE html>
-    <html lang="pt-br">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Notificação de Vazamento</title>
-        <style>
-            body {{
-                font-family: 'Arial', sans-serif;
-                background-color: #f4f4f9;
-                margin: 0;
-                padding: 0;
-            }}
-            .container {{
-                width: 100%;
-                max-width: 600px;
-                margin: 0 auto;
-                padding: 20px;
-                background-color: #ffffff;
-                border-radius: 8px;
-                box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
-            }}
-            .header {{
-                background-color: #4CAF50;
-                color: white;
-                padding: 15px;
-                border-radius: 8px 8px 0 0;
-                text-align: center;
-            }}
-            .content {{
-                margin: 20px 0;
-                font-size: 16px;
-                line-height: 1.6;
-            }}
-            .content a {{
-                color: #4CAF50;
-                text-decoration: none;
-            }}
-            .image-container {{
-                text-align: center;
-                margin: 20px 0;
-            }}
-            .image-container img {{
-                width: 80%;
-                max-width: 500px;
-                height: auto;
-                border-radius: 8px;
-                box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
-            }}
-            .footer {{
-                text-align: center;
-                font-size: 14px;
-                color: #888888;
-                margin-top: 30px;
-            }}
-            .button {{
-                display: inline-block;
-                background-color: #4CAF50;
-                color: white;
-                padding: 10px 20px;
-                text-decoration: none;
-                border-radius: 5px;
-                margin-top: 20px;
-                text-align: center;
-            }}
-            .button:hover {{
-                background-color: #45a049;
-            }}
-            .note {{
-                font-size: 14px;
-                color: #888888;
-                margin-top: 10px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h2>Alerta de Vazamento de Dados</h2>
-            </div>
-            <div class="content">
-                <p>Olá Usuario,</p>
-                <p>Um novo vazamento foi identificado relacionado ao seu e-mail:</p>
-                <p><strong>Título:</strong> {titulo_vazamento}</p>
-                <p><strong>Data:</strong> {data}</p>
-                <p><strong>Descrição:</strong> {descricao}</p>
-
-                <!-- Exibe a imagem do vazamento -->
-                <div class="image-container">
-                    <img src="{image_uri}" alt="Imagem do Vazamento">
-                </div>
-
-                <p>Recomendamos que altere suas senhas imediatamente e esteja atento a possíveis fraudes.</p>
-            </div>
-            <div class="footer">
-                <p>Atenciosamente,</p>
-                <p><strong>Equipe de Segurança Start Osinc Sec - SOS</strong></p>
-                <p class="note">Se você não reconhece esse e-mail, por favor, ignore ou entre em contato conosco.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    mensagem_html = renderizar_notificacao_demonstrativo(titulo_vazamento, data, descricao, image_uri)
 
     assunto = f"Novo vazamento detectado: {titulo_vazamento}"
     await enviar_email(email_usuario, assunto, mensagem_html)
@@ -137,7 +42,7 @@ async def notificar_vazamento_usuario_por_email_demonstrativo(email_usuario: str
 
 def processar_vazamento(vazamento_data: dict) -> dict:
     """
-    Processa os dados de um vazamento para o formato do banco de dados.
+    Processa os dados de um vazamento retornado pela consulta por conta para o formato do catálogo.
     Faz conversões de data e atribuições de valores padrão.
     """
     return {
@@ -147,7 +52,7 @@ def processar_vazamento(vazamento_data: dict) -> dict:
         "data_vazamento": datetime.strptime(vazamento_data.get("BreachDate", ""), "%Y-%m-%d").date()
         if vazamento_data.get("BreachDate")
         else None,
-        "data_adicao": datetime.utcnow(),  # Preenche com a data atual
+        "data_adicao": _converter_data_hora_hibp(vazamento_data.get("AddedDate")),
         "data_atualizacao": datetime.strptime(vazamento_data.get("ModifiedDate", ""), "%Y-%m-%dT%H:%M:%SZ")
         if vazamento_data.get("ModifiedDate")
         else None,
@@ -158,29 +63,162 @@ def processar_vazamento(vazamento_data: dict) -> dict:
     }
 
 
-async def buscar_vazamentos_na_api(email: str) -> Optional[list[dict]]:
+def _converter_data_hora_hibp(valor: Optional[str]) -> Optional[datetime]:
+    return datetime.strptime(valor, "%Y-%m-%dT%H:%M:%SZ") if valor else None
+
+
+def processar_vazamento_catalogo(vazamento_data: dict) -> dict:
+    """
+    Converte um vazamento do endpoint /breaches para o formato da tabela de catálogo.
+    """
+    return {
+        "nome": vazamento_data.get("Name"),
+        "titulo": vazamento_data.get("Title", ""),
+        "dominio_url": vazamento_data.get("Domain", ""),
+        "data_vazamento": datetime.strptime(vazamento_data["BreachDate"], "%Y-%m-%d").date()
+        if vazamento_data.get("BreachDate")
+        else None,
+        "data_adicao": _converter_data_hora_hibp(vazamento_data.get("AddedDate")),
+        "data_atualizacao": _converter_data_hora_hibp(vazamento_data.get("ModifiedDate")),
+        "pwn_count": vazamento_data.get("PwnCount", 0),
+        "descricao": vazamento_data.get("Description", None),
+        "image_uri": vazamento_data.get("LogoPath", None),
+        "data_classes": vazamento_data.get("DataClasses", []),
+        "sincronizado_em": datetime.utcnow(),
+    }
+
+
+def processar_vazamento_do_catalogo(catalogo) -> dict:
+    """
+    Monta os dados de um vazamento (mesmo formato de `processar_vazamento`) a partir de uma
+    entrada do catálogo local. A data em que o usuário foi associado fica em `primeira_deteccao_em`.
+    """
+    return {
+        "nome": catalogo.nome,
+        "titulo": catalogo.titulo or "",
+        "dominio_url": catalogo.dominio_url or "",
+        "data_vazamento": catalogo.data_vazamento,
+        "data_adicao": catalogo.data_adicao,
+        "data_atualizacao": catalogo.data_atualizacao,
+        "descricao": catalogo.descricao,
+        "image_uri": catalogo.image_uri,
+        "pwn_count": catalogo.pwn_count or 0,
+        "data_classes": catalogo.data_classes,
+    }
+
+
+def _obter_retry_after(response: httpx.Response) -> float:
+    try:
+        return max(1.0, float(response.headers.get("Retry-After", HIBP_RETRY_AFTER_PADRAO)))
+    except ValueError:
+        return HIBP_RETRY_AFTER_PADRAO
+
+
+def gerar_chave_cache_hibp(email: str) -> str:
+    """
+    Gera a chave de cache da consulta HIBP a partir do e-mail normalizado e com hash,
+    evitando guardar e-mails em texto puro no Redis.
+    """
+    email_normalizado = email.strip().lower()
+    return f"hibp:conta:{hashlib.sha256(email_normalizado.encode()).hexdigest()}"
+
+
+async def buscar_vazamentos_na_api(email: str, cliente: Optional[httpx.AsyncClient] = None,
+                                   ignorar_cache: bool = False) -> Optional[list[dict]]:
+    """
+    Busca os vazamentos de um e-mail, passando primeiro pelo cache do Redis.
+    Respostas positivas e 404 ("nenhum vazamento") são guardadas com TTLs separados.
+    Com `ignorar_cache=True` a API é sempre consultada e o cache é atualizado com o resultado.
+    """
+    chave_cache = gerar_chave_cache_hibp(email)
+
+    if not ignorar_cache:
+        cached_data = await get_cache(chave_cache)
+        if cached_data is not None:
+            if cached_data["vazamentos"] is None:
+                raise HTTPException(status_code=404, detail="Nenhum vazamento foi encontrado para este e-mail.")
+            return cached_data["vazamentos"]
+
+    try:
+        vazamentos = await consultar_vazamentos_na_api(email, cliente)
+    except HTTPException as e:
+        if e.status_code == 404:
+            await set_cache(chave_cache, {"vazamentos": None}, HIBP_CACHE_TTL_NEGATIVO)
+        raise
+
+    await set_cache(chave_cache, {"vazamentos": vazamentos}, HIBP_CACHE_TTL_POSITIVO)
+    return vazamentos
+
+
+async def consultar_vazamentos_na_api(email: str, cliente: Optional[httpx.AsyncClient] = None) -> Optional[list[dict]]:
     """
     Faz uma requisição à API Have I Been Pwned para buscar vazamentos por e-mail.
+    Usa o cliente HTTP compartilhado (pool de conexões) quando nenhum cliente é informado.
+    Cada requisição aguarda um token do limitador compartilhado; respostas 429 bloqueiam o
+    limitador pelo tempo do Retry-After e a requisição é refeita automaticamente.
     Lança exceções personalizadas para erros conhecidos.
     """
     url = API_URL_TEMPLATE.format(email=email)
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=HEADERS)
+    cliente = cliente or await obter_cliente_hibp()
+
+    for tentativa in range(1, HIBP_MAX_TENTATIVAS_429 + 1):
+        await limitador_hibp.aguardar_token()
+
+        try:
+            inicio = time.perf_counter()
+            response = await cliente.get(url)
+            await _registrar_chamada_hibp(time.perf_counter() - inicio, response.status_code)
+            response.raise_for_status()
+            return response.json()
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                raise HTTPException(status_code=404, detail="Nenhum vazamento foi encontrado para este e-mail.")
+            elif e.response.status_code == 429 and tentativa < HIBP_MAX_TENTATIVAS_429:
+                await limitador_hibp.aplicar_retry_after(_obter_retry_after(e.response))
+                logging.warning(f"HIBP retornou 429. Nova tentativa ({tentativa + 1}/{HIBP_MAX_TENTATIVAS_429}).")
+            else:
+                if e.response.status_code == 429:
+                    await limitador_hibp.aplicar_retry_after(_obter_retry_after(e.response))
+                raise HTTPException(
+                    status_code=e.response.status_code,
+                    detail=f"Erro na requisição para a API externa: {e.response.text}",
+                )
+        except httpx.RequestError as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao conectar à API externa: {str(e)}")
+        except ValueError:
+            raise HTTPException(status_code=500, detail="Erro ao processar a resposta da API externa. Não é um JSON válido.")
+
+
+async def _registrar_chamada_hibp(segundos: float, status_code: int):
+    metricas = metricas_atuais()
+    if metricas is None:
+        return
+    await metricas.registrar_latencia_hibp(segundos)
+    if status_code == 429:
+        await metricas.incrementar("hibp_respostas_429")
+    elif status_code >= 500:
+        await metricas.incrementar("hibp_erros_servidor")
+
+
+async def buscar_catalogo_na_api(cliente: Optional[httpx.AsyncClient] = None) -> list[dict]:
+    """
+    Busca o catálogo completo de vazamentos publicados pela API HIBP (endpoint /breaches).
+    Esse endpoint não exige chave de API nem consome a cota de requisições da conta.
+    """
+    cliente = cliente or await obter_cliente_hibp()
 
     try:
+        response = await cliente.get(API_URL_CATALOGO)
         response.raise_for_status()
         return response.json()
 
     except httpx.HTTPStatusError as e:
-        if e.response.status_code == 404:
-            raise HTTPException(status_code=404, detail="Nenhum vazamento foi encontrado para este e-mail.")
-        else:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Erro na requisição para a API externa: {e.response.text}",
-            )
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Erro ao buscar o catálogo de vazamentos na API externa: {e.response.text}",
+        )
     except httpx.RequestError as e:
         raise HTTPException(status_code=500, detail=f"Erro ao conectar à API externa: {str(e)}")
     except ValueError:
-        raise HTTPException(status_code=500, detail="Erro ao processar a resposta da API externa. Não é um JSON válido.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Erro ao processar a resposta da API externa. Não é um JSON válido.")
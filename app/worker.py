@@ -0,0 +1,54 @@
+"""
+Processo de tarefas em segundo plano, separado da API.
+
+Executa o agendador (automação de vazamentos, sincronização do catálogo e entrega da
+caixa de saída de e-mails) sem montar a aplicação FastAPI. Para usá-lo, suba a API com
+AGENDADOR_HABILITADO=false e inicie quantos workers forem necessários:
+
+    python -m app.worker
+"""
+import asyncio
+import logging
+import os
+import signal
+
+from app.db.database import async_engine
+from app.db.redis.redis_cache import redis
+from app.services.EmailService import encerrar_pool_smtp
+from app.services.automacoes.TarefaVazamento import iniciar_agendador, encerrar_agendador
+from app.utils.HibpClient import iniciar_cliente_hibp, encerrar_cliente_hibp
+from app.utils.TemplatesEmail import carregar_templates
+
+LOG_FILE_PATH = os.path.join(os.getcwd(), "worker-logs.log")
+
+
+async def executar_worker():
+    carregar_templates()
+    iniciar_cliente_hibp()
+    scheduler = await iniciar_agendador()
+    logging.info(f"Worker {os.getpid()} iniciado.")
+
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sinal, parar.set)
+
+    try:
+        await parar.wait()
+    finally:
+        logging.info(f"Encerrando o worker {os.getpid()}.")
+        await encerrar_agendador(scheduler)
+        await encerrar_cliente_hibp()
+        await encerrar_pool_smtp()
+        await async_engine.dispose()
+        await redis.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        filename=LOG_FILE_PATH,
+        filemode="a"
+    )
+    asyncio.run(executar_worker())
@@ -3,16 +3,20 @@ import logging
 import os
 from datetime import datetime
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from fastapi import FastAPI, Depends
 from starlette.middleware.cors import CORSMiddleware
 
+from app.controller.AdminController import routeradmin as api_router_admin
 from app.controller.AutenticacaoController import routerautenticacao as api_router_autenticacao
 from app.controller.UsuarioController import routerusuarios as api_router_usuarios
 from app.controller.VazamentoController import router as api_router
-from app.db.database import Base, engine
+from app.db.database import Base, engine, async_engine
 from app.db.redis.redis_cache import redis
-from app.services.automacoes.TarefaVazamento import iniciar_agendador
+from app.db.replicas import iniciar_monitoramento_replicas, encerrar_replicas
+from app.services.EmailService import encerrar_pool_smtp
+from app.services.automacoes.TarefaVazamento import iniciar_agendador, encerrar_agendador
+from app.utils.HibpClient import iniciar_cliente_hibp, encerrar_cliente_hibp
+from app.utils.TemplatesEmail import carregar_templates
 
 LOG_FILE_PATH = os.path.join(os.getcwd(), "aplicacao-logs.log")
 logging.basicConfig(
@@ -26,6 +30,9 @@ logging.info("Configuração de log iniciada.")
 
 logging.info("Teste: configurando o logging.")
 
+# Com "false", a API não executa tarefas em segundo plano; elas ficam com `python -m app.worker`.
+AGENDADOR_HABILITADO = os.getenv("AGENDADOR_HABILITADO", "true").lower() == "true"
+
 
 
 app = FastAPI()
@@ -50,23 +57,35 @@ app.add_middleware(
 app.include_router(api_router, prefix="/v1/api", tags=["Vazamentos"])
 app.include_router(api_router_usuarios, prefix="/v1/api")
 app.include_router(api_router_autenticacao, prefix="/v1/api", tags=["Autenticacao"])
+app.include_router(api_router_admin, prefix="/v1/api", tags=["Admin"])
 
-scheduler = AsyncIOScheduler()
+scheduler = None
 
 
 @app.on_event("startup")
 async def startup_event():
     global scheduler
-    scheduler = iniciar_agendador()
-    logging.info("Agendador iniciado junto com a API.")
+    carregar_templates()
+    iniciar_cliente_hibp()
+    await iniciar_monitoramento_replicas()
+    if AGENDADOR_HABILITADO:
+        scheduler = await iniciar_agendador()
+        logging.info("Agendador iniciado junto com a API.")
+    else:
+        logging.info("Agendador desabilitado na API; as tarefas rodam no worker.")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     if scheduler:
-        scheduler.shutdown()
+        await encerrar_agendador(scheduler)
         logging.info("Agendador encerrado com a API.")
 
+    await encerrar_cliente_hibp()
+    await encerrar_pool_smtp()
+    await encerrar_replicas()
+    await async_engine.dispose()
+
     await redis.close()
     logging.info("Conexão com o Redis encerrada.")
 